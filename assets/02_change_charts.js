@@ -0,0 +1,173 @@
+/*
+    Client side drawing of the change from baseline and change from prior
+    period charts.
+
+    The server sends the selected report's latest vintage series once (the
+    "report-series" store) along with empty chart layouts.  Changing the
+    start date or zooming is then handled entirely in the browser: slice
+    from the start date, rebase, downsample to the point budget and fill in
+    the trace.
+*/
+
+// Index of the first date on or after target - dates are sorted YYYY-MM-DD
+function firstOnOrAfter(dates, target) {
+    let lo = 0;
+    let hi = dates.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (dates[mid] < target) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        }
+    }
+    return lo;
+}
+
+// Largest-Triangle-Three-Buckets - same as lttb_indices in support_functions
+function lttbIndices(x, y, threshold) {
+    const n = x.length;
+    if (threshold >= n || threshold < 3) {
+        return x.map((_, i) => i);
+    }
+
+    const yv = y.map(v => (v === null || isNaN(v) ? 0 : v));
+    const edges = [];
+    for (let i = 0; i < threshold - 1; i++) {
+        edges.push(Math.floor(1 + (i * (n - 2)) / (threshold - 2)));
+    }
+    edges.push(n);
+
+    const out = [0];
+    let a = 0;
+    for (let i = 0; i < threshold - 2; i++) {
+        const start = edges[i];
+        const stop = edges[i + 1];
+        let nextX = 0;
+        let nextY = 0;
+        for (let j = stop; j < edges[i + 2]; j++) {
+            nextX += x[j];
+            nextY += yv[j];
+        }
+        nextX /= edges[i + 2] - stop;
+        nextY /= edges[i + 2] - stop;
+
+        let best = start;
+        let bestArea = -1;
+        for (let j = start; j < stop; j++) {
+            const area = Math.abs(
+                (x[a] - nextX) * (yv[j] - yv[a]) - (x[a] - x[j]) * (nextY - yv[a])
+            );
+            if (area > bestArea) {
+                bestArea = area;
+                best = j;
+            }
+        }
+        out.push(best);
+        a = best;
+    }
+    out.push(n - 1);
+    return out;
+}
+
+// Zoomed x range from a relayout - see relayout_window in support_functions
+function relayoutWindow(relayout) {
+    if (!relayout) {
+        return null;
+    }
+    if (relayout["xaxis.autorange"]) {
+        return "reset";
+    }
+    if ("xaxis.range[0]" in relayout) {
+        return [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]];
+    }
+    if ("xaxis.range" in relayout) {
+        return relayout["xaxis.range"];
+    }
+    return null;
+}
+
+// Build one of the change charts.  kind is "baseline" or "period".
+function changeChart(kind, graphId, series, startDate, relayout) {
+    const clientside = window.dash_clientside;
+    if (!series || !startDate) {
+        return clientside.no_update;
+    }
+
+    // Only a zoom of this graph uses a window - a new report or date always
+    // gets the full chart
+    let window_ = null;
+    const ctx = clientside.callback_context;
+    const triggered = ctx ? ctx.triggered.map(t => t.prop_id) : [];
+    if (triggered.length === 1 && triggered[0] === graphId + ".relayoutData") {
+        window_ = relayoutWindow(relayout);
+        if (window_ === null) {
+            return clientside.no_update;
+        }
+        if (window_ === "reset") {
+            window_ = null;
+        }
+    }
+
+    // Slice from the start date and rebase - same as period_change
+    const first = firstOnOrAfter(series.dates, startDate.slice(0, 10));
+    let dates = series.dates.slice(first);
+    const values = series.values.slice(first);
+    let changes;
+    if (kind === "baseline") {
+        changes = values.map(v => 1 - values[0] / v);
+    } else {
+        changes = values.map((v, i) => (i === 0 ? null : v / values[i - 1] - 1));
+    }
+
+    // Cut down to the zoomed window and the point budget
+    if (window_ !== null) {
+        const lo = firstOnOrAfter(dates, String(window_[0]).slice(0, 10));
+        const hi = firstOnOrAfter(dates, String(window_[1]).slice(0, 10) + "~");
+        dates = dates.slice(lo, hi);
+        changes = changes.slice(lo, hi);
+    }
+    if (dates.length > series.point_budget) {
+        const x = dates.map(d => Date.parse(d));
+        const keep = lttbIndices(x, changes, series.point_budget);
+        dates = keep.map(i => dates[i]);
+        changes = keep.map(i => changes[i]);
+    }
+
+    const layout = JSON.parse(JSON.stringify(series.layouts[kind]));
+    if (window_ !== null) {
+        layout.xaxis = Object.assign({}, layout.xaxis, {
+            range: window_,
+            autorange: false,
+        });
+    }
+
+    return {
+        data: [
+            {
+                type: dates.length > series.webgl_threshold ? "scattergl" : "scatter",
+                x: dates,
+                y: changes,
+                name: kind === "baseline" ? "Baseline" : "Relative",
+                line: {width: 2},
+                fill: "tozeroy",
+            },
+        ],
+        layout: layout,
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    fed: {
+        baseline_chart: function (series, startDate, relayout) {
+            return changeChart(
+                "baseline", "change-from-baseline-chart", series, startDate, relayout
+            );
+        },
+        period_chart: function (series, startDate, relayout) {
+            return changeChart(
+                "period", "change-from-period-chart", series, startDate, relayout
+            );
+        },
+    },
+});
@@ -0,0 +1,280 @@
+"""
+    Concurrent user load test for the dashboard callbacks.
+
+    Each simulated analyst opens the page and then keeps switching reports
+    and start dates, firing the same _dash-update-component requests the
+    browser does.  Like the browser, the callbacks for one action are sent
+    together in parallel.  Throughput and p50 / p95 / p99 latency are
+    reported per callback.
+
+    By default the app runs in process against a generated dump and
+    requests go through the Flask test client, so nothing needs a network.
+    Point --url at a running server (e.g. gunicorn) to test that instead.
+
+        python benchmarks/load_test.py --users 8 --duration 30
+        python benchmarks/load_test.py --users 32 --url http://127.0.0.1:8050
+
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+import run_benchmarks as rb
+
+# Callbacks each action fires.  The change charts are drawn in the browser
+# so a start date change only comes back for the basic and category charts.
+actions = {
+    "open": [
+        "display_page",
+        "report_dropdown",
+        "basic_report",
+        "report_series",
+        "category_period_report",
+        "category_baseline_report",
+        "dashboard_summary_numbers",
+    ],
+    "switch_report": [
+        "basic_report",
+        "report_series",
+        "category_period_report",
+        "category_baseline_report",
+        "dashboard_summary_numbers",
+    ],
+    "change_start_date": [
+        "basic_report",
+        "category_period_report",
+        "category_baseline_report",
+    ],
+}
+
+# Start dates analysts pick from
+start_dates = [
+    d.strftime("%Y-%m-%d") for d in pd.date_range("2008-01-01", "2021-01-01", freq="QS")
+]
+
+
+#############################################################################
+# Clients
+#############################################################################
+# In process through the Flask test client.  Test clients aren't meant to
+# be shared between threads so each sending thread gets its own.
+class TestClient:
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, body):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.server.test_client()
+        resp = self.local.client.post("/_dash-update-component", json=body)
+        return resp.status_code
+
+
+# A real server over HTTP
+class HttpClient:
+    def __init__(self, url):
+        self.url = url.rstrip("/") + "/_dash-update-component"
+
+    def post(self, body):
+        return self.request(body)[0]
+
+    # Status and decoded response body
+    def request(self, body):
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as error:
+            return error.code, b""
+
+    # The reports the server has data for, from its report dropdown
+    def reports(self):
+        body = rb.session_callbacks(None, None)["report_dropdown"]
+        status, payload = self.request(body)
+        if status != 200:
+            raise RuntimeError("couldn't get the report list: %d" % status)
+        options = json.loads(payload)["response"]["report"]["options"]
+        return [option["value"] for option in options]
+
+
+#############################################################################
+# Sessions
+#############################################################################
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.actions = 0
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, status):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if status not in (200, 204):
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+# Send one action's callbacks in parallel and wait for them all
+def run_action(client, pool, recorder, action, report, start_date):
+    bodies = rb.session_callbacks(report, start_date)
+
+    def send(name):
+        start = time.perf_counter()
+        status = client.post(bodies[name])
+        recorder.record(name, time.perf_counter() - start, status)
+
+    list(pool.map(send, actions[action]))
+    with recorder.lock:
+        recorder.actions += 1
+
+
+# One analyst - open the page, then switch reports or dates until time's up
+def run_user(user, make_client, reports, recorder, deadline, think, seed):
+    rng = random.Random(seed + user)
+    client = make_client()
+    report = rng.choice(reports)
+    start_date = rng.choice(start_dates)
+    with ThreadPoolExecutor(max_workers=len(actions["open"])) as pool:
+        run_action(client, pool, recorder, "open", report, start_date)
+        while time.monotonic() < deadline:
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+            if rng.random() < 0.5:
+                report = rng.choice(reports)
+                action = "switch_report"
+            else:
+                start_date = rng.choice(start_dates)
+                action = "change_start_date"
+            run_action(client, pool, recorder, action, report, start_date)
+
+
+#############################################################################
+# Results
+#############################################################################
+def summarize(recorder, seconds):
+    results = {}
+    for name, latencies in sorted(recorder.latencies.items()):
+        ms = np.array(latencies) * 1000
+        results[name] = {
+            "requests": len(ms),
+            "errors": recorder.errors.get(name, 0),
+            "requests_per_second": round(len(ms) / seconds, 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+        }
+    total = sum(len(l) for l in recorder.latencies.values())
+    return {
+        "seconds": round(seconds, 3),
+        "requests": total,
+        "requests_per_second": round(total / seconds, 2),
+        "actions_per_second": round(recorder.actions / seconds, 2),
+        "errors": sum(recorder.errors.values()),
+        "callbacks": results,
+    }
+
+
+def print_summary(summary):
+    print(
+        "%d requests in %.1fs - %.1f requests/s, %.1f actions/s, %d errors"
+        % (
+            summary["requests"],
+            summary["seconds"],
+            summary["requests_per_second"],
+            summary["actions_per_second"],
+            summary["errors"],
+        )
+    )
+    print(
+        "%-28s %9s %8s %9s %9s %9s %7s"
+        % ("callback", "requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors")
+    )
+    for name, result in summary["callbacks"].items():
+        print(
+            "%-28s %9d %8.1f %9.2f %9.2f %9.2f %7d"
+            % (
+                name,
+                result["requests"],
+                result["requests_per_second"],
+                result["p50_ms"],
+                result["p95_ms"],
+                result["p99_ms"],
+                result["errors"],
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--users", type=int, default=8, help="simultaneous analysts")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument(
+        "--think", type=float, default=0, help="mean seconds between actions"
+    )
+    parser.add_argument("--url", help="test a running server instead")
+    parser.add_argument(
+        "--scale", type=int, default=1, help="size of the generated dump"
+    )
+    parser.add_argument(
+        "--data", help="directory with a fed_dump.csv to use instead of generating"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+        reports = make_client().reports()
+    else:
+        sf, bl, app_main = rb.load_app(args.data, args.scale)
+        reports = list(bl.get_dataset().fed_index)
+        make_client = lambda: TestClient(app_main.app)
+
+    recorder = Recorder()
+    start = time.monotonic()
+    deadline = start + args.duration
+    users = [
+        threading.Thread(
+            target=run_user,
+            args=(
+                user,
+                make_client,
+                reports,
+                recorder,
+                deadline,
+                args.think,
+                args.seed,
+            ),
+        )
+        for user in range(args.users)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+
+    summary = summarize(recorder, time.monotonic() - start)
+    summary["users"] = args.users
+    summary["think"] = args.think
+    summary["target"] = args.url or "in process, scale %d" % args.scale
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(summary, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
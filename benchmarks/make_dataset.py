@@ -0,0 +1,160 @@
+"""
+    Generates a synthetic FRED-shaped dump for benchmarking and load tests.
+
+    The output has the same columns as data/fed_dump.csv written by
+    data_miner/pull_fed_data.py - release_date, report_date, data,
+    report_name and hash - so the dashboard loads it unchanged.  Series
+    names come from the report registry so labels and categories work.
+    Asking for more series than the registry has adds SYNnnnn series with
+    no category.
+
+    Every observation is released a little after its period ends and then
+    revised each month for as many vintages as asked for.
+
+    --scale multiplies the vintages per observation, so with the defaults
+    --scale 10 and --scale 100 give 10 and 100 times the rows of a normal
+    dump.
+
+        python benchmarks/make_dataset.py --scale 10 --output /tmp/fed/fed_dump.csv
+
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# The registry lives in the repository root and the downloader in data_miner
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(repo_dir)
+sys.path.append(os.path.join(repo_dir, "data_miner"))
+import report_registry as rr
+import pull_fed_data as pfd
+
+# Shape of a normal dump - what --scale 1 reproduces
+default_start = "2008-01-01"
+default_years = 14
+default_vintages = 3
+
+# pandas offsets for each frequency
+frequencies = {"weekly": "W-SAT", "monthly": "MS", "quarterly": "QS"}
+
+# Days after the period before the first release, and between revisions
+release_lag = 30
+revision_gap = 30
+
+
+# The frequency each series is published at.  "native" follows the registry
+# categories - the weekly categories are weekly, everything else monthly.
+def series_frequency(name, frequency):
+    if frequency != "native":
+        return frequency
+    if rr.report_categories.get(name, "").endswith("Weekly"):
+        return "weekly"
+    return "monthly"
+
+
+# Registry names first, then made up ones if more are wanted
+def series_names(count):
+    names = list(rr.report_list)[:count]
+    names += ["SYN%04d" % i for i in range(count - len(names))]
+    return names
+
+
+# Every vintage of one series as arrays.  Values are a random walk with
+# each revision nudging the previous vintage.
+def make_series(name, rng, start, years, frequency, vintages):
+    dates = pd.date_range(
+        start,
+        pd.Timestamp(start) + pd.DateOffset(years=years) - pd.Timedelta(days=1),
+        freq=frequencies[series_frequency(name, frequency)],
+    ).values.astype("datetime64[D]")
+    level = 100 + rng.standard_normal(len(dates)).cumsum()
+
+    revisions = rng.standard_normal((len(dates), vintages)) * 0.1
+    revisions[:, 0] = 0
+    values = level[:, None] + revisions.cumsum(axis=1)
+
+    lags = release_lag + revision_gap * np.arange(vintages)
+    release = dates[:, None] + lags[None, :].astype("timedelta64[D]")
+    report = np.repeat(dates, vintages)
+
+    return report, release.ravel(), values.ravel()
+
+
+def make_dataset(
+    series=len(rr.report_list),
+    start=default_start,
+    years=default_years,
+    frequency="native",
+    vintages=default_vintages,
+    seed=0,
+):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for name in series_names(series):
+        report, release, values = make_series(
+            name, rng, start, years, frequency, vintages
+        )
+        parts.append(
+            pd.DataFrame(
+                {
+                    "release_date": release,
+                    "report_date": report,
+                    "data": values.round(3),
+                    "report_name": name,
+                }
+            )
+        )
+    df = pd.concat(parts, ignore_index=True)
+
+    # Same stable row hash the downloader stores, which is taken over the
+    # dates as the ISO strings FRED sends
+    dated = df.assign(
+        release_date=np.datetime_as_string(df["release_date"].values, unit="D"),
+        report_date=np.datetime_as_string(df["report_date"].values, unit="D"),
+    )
+    df["hash"] = pfd.hash_rows(
+        dated.astype({"release_date": object, "report_date": object}), pfd.hash_columns
+    )
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--series", type=int, default=len(rr.report_list))
+    parser.add_argument("--start", default=default_start)
+    parser.add_argument("--years", type=int, default=default_years)
+    parser.add_argument(
+        "--frequency",
+        choices=["native"] + list(frequencies),
+        default="native",
+    )
+    parser.add_argument("--vintages", type=int, default=default_vintages)
+    parser.add_argument(
+        "--scale", type=int, default=1, help="multiply the vintages per observation"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="./data/fed_dump.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = make_dataset(
+        series=args.series,
+        start=args.start,
+        years=args.years,
+        frequency=args.frequency,
+        vintages=args.vintages * args.scale,
+        seed=args.seed,
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    df.to_csv(args.output, index=False, date_format="%Y-%m-%d")
+    print(
+        "Wrote %d rows for %d series to %s in %.1fs"
+        % (len(df), args.series, args.output, time.perf_counter() - start)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+    Reports how much memory the loaded data takes, per column and per part
+    of the dataset, in the normal and compact layouts.
+
+    The numbers are what the dataframes and index arrays hold, strings
+    included - use them with worker_memory.py, which measures whole
+    processes, to size pods.
+
+        python benchmarks/memory_report.py
+        python benchmarks/memory_report.py --data /tmp/fed --layouts compact
+
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchmark_dir, ".."))
+
+# Layout name -> (compact_data, compact_float32)
+layouts = {
+    "standard": (False, False),
+    "compact": (True, False),
+    "compact_float32": (True, True),
+}
+
+
+def measure(sf, bl, layout):
+    sf.compact_data, sf.compact_float32 = layouts[layout]
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = sf.get_fed_data()
+    columns = sf.memory_report(df)
+    data = bl.Dataset(df, 1, None)
+    del df
+    parts = data.memory_usage()
+    return {
+        "rows": data.rows,
+        "columns": {
+            name: {"dtype": row["dtype"], "bytes": int(row["bytes"])}
+            for name, row in columns.iterrows()
+        },
+        "parts": parts,
+        "total_bytes": sum(parts.values()),
+    }
+
+
+def print_layout(layout, result):
+    rows = max(result["rows"], 1)
+    print("%s - %d rows" % (layout, result["rows"]))
+    for name, column in result["columns"].items():
+        print(
+            "  %-16s %-14s %14d bytes %8.1f per row"
+            % (name, column["dtype"], column["bytes"], column["bytes"] / rows)
+        )
+    for part, size in result["parts"].items():
+        print("  %-31s %14d bytes %8.1f per row" % (part, size, size / rows))
+    print(
+        "  %-31s %14d bytes (%.1f MB)"
+        % ("dataset total", result["total_bytes"], result["total_bytes"] / 2**20)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--data", help="directory with the fed_dump.csv to measure")
+    parser.add_argument(
+        "--layouts", nargs="+", choices=list(layouts), default=list(layouts)
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    import support_functions as sf
+
+    if args.data:
+        sf.base_path = os.path.join(os.path.abspath(args.data), "")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import business_logic as bl
+
+    results = {}
+    for layout in args.layouts:
+        results[layout] = measure(sf, bl, layout)
+        print_layout(layout, results[layout])
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+    Benchmark suite for the data functions, chart builders and callbacks.
+
+    A synthetic dump is generated with make_dataset.py (or an existing one
+    is used with --data), the app is loaded against it and each benchmark
+    is timed over a number of repeats.  Callbacks are posted to the real
+    _dash-update-component endpoint through the Flask test client, both
+    cold (caches cleared first) and warm.
+
+    Results are written as JSON so runs can be compared:
+
+        python benchmarks/run_benchmarks.py --scale 1 --output before.json
+        ... make changes ...
+        python benchmarks/run_benchmarks.py --scale 1 --output after.json
+        python benchmarks/run_benchmarks.py --compare before.json after.json
+
+"""
+import argparse
+import atexit
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.join(benchmark_dir, "..")
+sys.path.insert(0, repo_dir)
+
+import make_dataset
+
+# Benchmarks slower than this ratio in --compare get flagged
+regression_ratio = 1.1
+
+# Registered benchmarks - name, function, setup run untimed before each call
+benchmarks = []
+
+
+def benchmark(name, setup=None):
+    def register(func):
+        benchmarks.append((name, func, setup))
+        return func
+
+    return register
+
+
+# Time func over repeat calls.  Times are in milliseconds.
+def time_call(func, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(times), 4),
+        "median_ms": round(statistics.median(times), 4),
+        "mean_ms": round(statistics.mean(times), 4),
+        "max_ms": round(max(times), 4),
+        "stdev_ms": round(statistics.stdev(times), 4) if repeat > 1 else 0.0,
+    }
+
+
+#############################################################################
+# Callback requests
+#############################################################################
+# Dash posts one request per callback to _dash-update-component.  These
+# build the same bodies the browser sends for each callback in main.py.
+def prop(component, name, value):
+    return {"id": component, "property": name, "value": value}
+
+
+def callback_body(output, inputs, state=(), changed=None):
+    component, name = output.rsplit(".", 1)
+    return {
+        "output": output,
+        "outputs": {"id": component, "property": name},
+        "inputs": list(inputs),
+        "state": list(state),
+        "changedPropIds": changed or [i["id"] + "." + i["property"] for i in inputs],
+    }
+
+
+# Every server side callback as it fires for one page view
+def session_callbacks(report, start_date, as_of=None, version=1):
+    common = [prop("as-of-date", "date", as_of), prop("data-version", "data", version)]
+    return {
+        "display_page": callback_body(
+            "page-content.children", [prop("url", "pathname", "/")]
+        ),
+        "check_data_version": callback_body(
+            "data-version.data",
+            [prop("data-check", "n_intervals", 1)],
+            [prop("data-version", "data", version)],
+        ),
+        "report_dropdown": callback_body(
+            "report.options", [prop("data-version", "data", version)]
+        ),
+        "basic_report": callback_body(
+            "basic-chart.figure",
+            [
+                prop("report", "value", report),
+                prop("start-date", "date", start_date),
+                prop("basic-chart", "relayoutData", None),
+            ]
+            + common,
+            changed=["report.value"],
+        ),
+        "report_series": callback_body(
+            "report-series.data",
+            [prop("report", "value", report)] + common,
+            changed=["report.value"],
+        ),
+        "category_period_report": callback_body(
+            "category-period-chart.figure",
+            [prop("report", "value", report), prop("start-date", "date", start_date)]
+            + common,
+            changed=["report.value"],
+        ),
+        "category_baseline_report": callback_body(
+            "category-baseline-chart.figure",
+            [prop("report", "value", report), prop("start-date", "date", start_date)]
+            + common,
+            changed=["report.value"],
+        ),
+        "dashboard_summary_numbers": callback_body(
+            "summary.children",
+            [prop("report", "value", report)] + common,
+            changed=["report.value"],
+        ),
+    }
+
+
+# Post a callback and fail loudly if it errors.  204 is a PreventUpdate.
+def post_callback(client, body):
+    resp = client.post("/_dash-update-component", json=body)
+    if resp.status_code not in (200, 204):
+        raise RuntimeError("%s returned %d" % (body["output"], resp.status_code))
+    return resp
+
+
+#############################################################################
+# App setup
+#############################################################################
+# Generate a dump (unless a directory with one is given), point the app at
+# it and import it.  Returns the support_functions, business_logic and main
+# modules.
+def load_app(data_dir=None, scale=1):
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix="fed_bench_")
+        atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+        df = make_dataset.make_dataset(vintages=make_dataset.default_vintages * scale)
+        df.to_csv(
+            os.path.join(data_dir, "fed_dump.csv"), index=False, date_format="%Y-%m-%d"
+        )
+
+    os.chdir(repo_dir)
+    import support_functions as sf
+
+    sf.base_path = os.path.join(os.path.abspath(data_dir), "")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import business_logic as bl
+        import main as app_main
+
+    return sf, bl, app_main
+
+
+#############################################################################
+# Benchmarks
+#############################################################################
+# Registered once the app is loaded against the benchmark data
+def register_benchmarks(sf, bl, main, report, start_date):
+    data = bl.get_dataset()
+    fed_df = data.fed_df
+    report_df = sf.get_report_from_fed_data(fed_df, report)
+    client = main.app.server.test_client()
+
+    def drop_store():
+        store_path = sf.base_path + sf.store_file
+        if os.path.exists(store_path):
+            os.remove(store_path)
+
+    def clear_caches():
+        bl.prepared_cache.clear()
+        sf.figure_cache.clear()
+
+    # Data functions
+    benchmark("data.get_fed_data.csv", setup=drop_store)(sf.get_fed_data)
+    benchmark("data.get_fed_data.store")(sf.get_fed_data)
+    benchmark("data.add_report_long_names")(lambda: sf.add_report_long_names(fed_df))
+    benchmark("data.get_report_from_fed_data")(
+        lambda: sf.get_report_from_fed_data(fed_df, report)
+    )
+    benchmark("data.get_report_from_index")(
+        lambda: sf.get_report_from_index(fed_df, data.fed_index, report)
+    )
+    benchmark("data.get_latest_data")(lambda: sf.get_latest_data(report_df))
+    benchmark("data.build_latest_data")(lambda: sf.build_latest_data(fed_df))
+    benchmark("data.build_category_cubes")(
+        lambda: sf.build_category_cubes(data.fed_latest)
+    )
+    benchmark("data.build_category_cubes.workers4")(
+        lambda: sf.build_category_cubes(data.fed_latest, workers=4)
+    )
+    benchmark("data.get_category_data_from_fed_data")(
+        lambda: sf.get_category_data_from_fed_data(fed_df, report, start_date)
+    )
+    benchmark("data.vintages.as_of")(lambda: data.vintages.as_of(start_date, report))
+    as_of_dates = [
+        d.strftime("%Y-%m-%d") for d in pd.date_range(start_date, periods=100, freq="W")
+    ]
+    benchmark("data.vintages.as_of_matrix.100")(
+        lambda: data.vintages.as_of_matrix(report, as_of_dates)
+    )
+
+    # Prepared data - cleared each time so the work is actually done
+    benchmark("prepare.report", setup=clear_caches)(
+        lambda: bl.get_prepared_report(report, start_date)
+    )
+    benchmark("prepare.category", setup=clear_caches)(
+        lambda: bl.get_prepared_category(report, start_date)
+    )
+    benchmark("prepare.trendline", setup=clear_caches)(
+        lambda: bl.get_trendline(report, start_date)
+    )
+    benchmark("prepare.report_series", setup=clear_caches)(
+        lambda: bl.get_report_series(report)
+    )
+
+    # Chart builders off already prepared data
+    prepared = bl.get_prepared_report(report, start_date)
+    category = bl.get_prepared_category(report, start_date)
+    trend = bl.get_trendline(report, start_date)
+    benchmark("chart.basic_chart")(
+        lambda: sf.basic_chart(prepared["raw"], prepared["long_name"], trend)
+    )
+    # The change charts are drawn in the browser, but the server side builder
+    # still has to keep up with a report's full latest series
+    latest = bl.get_latest_report(data, report, None)
+    changes = sf.period_change(
+        latest[latest["report_date"] >= pd.Timestamp(start_date)].copy()
+    )
+    benchmark("chart.baseline_change_chart")(
+        lambda: sf.baseline_change_chart(changes, prepared["long_name"])
+    )
+    benchmark("chart.periodic_change_chart")(
+        lambda: sf.periodic_change_chart(changes, prepared["long_name"])
+    )
+    benchmark("chart.category_chart_perodic")(
+        lambda: sf.category_chart_perodic(category["period"], category["category"])
+    )
+    benchmark("chart.category_chart_baseline")(
+        lambda: sf.category_chart_baseline(category["baseline"], category["category"])
+    )
+
+    # Callbacks end to end, including json encoding
+    for name, body in session_callbacks(report, start_date).items():
+        benchmark("callback.%s.cold" % name, setup=clear_caches)(
+            lambda body=body: post_callback(client, body)
+        )
+        benchmark("callback.%s.warm" % name)(
+            lambda body=body: post_callback(client, body)
+        )
+
+
+#############################################################################
+# Results
+#############################################################################
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=repo_dir,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_meta(args, rows):
+    import dash
+    import numpy as np
+    import plotly
+
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "dash": dash.__version__,
+        "plotly": plotly.__version__,
+        "scale": args.scale,
+        "data": args.data,
+        "rows": rows,
+        "report": args.report,
+        "start_date": args.start_date,
+        "repeat": args.repeat,
+    }
+
+
+# Side by side medians of two result files
+def compare(before_path, after_path):
+    with open(before_path) as before_file:
+        before = json.load(before_file)
+    with open(after_path) as after_file:
+        after = json.load(after_file)
+
+    print("%-48s %12s %12s %8s" % ("benchmark", "before ms", "after ms", "ratio"))
+    for name, result in after["results"].items():
+        if name not in before["results"]:
+            print("%-48s %12s %12.3f" % (name, "-", result["median_ms"]))
+            continue
+        old = before["results"][name]["median_ms"]
+        new = result["median_ms"]
+        ratio = new / old if old else float("inf")
+        flag = "  slower" if ratio > regression_ratio else ""
+        print("%-48s %12.3f %12.3f %7.2fx%s" % (name, old, new, ratio, flag))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument(
+        "--scale", type=int, default=1, help="size of the generated dump"
+    )
+    parser.add_argument(
+        "--data", help="directory with a fed_dump.csv to use instead of generating"
+    )
+    parser.add_argument("--report", default="CPIAUCSL")
+    parser.add_argument("--start-date", default="2015-01-01")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--filter", default="", help="only run matching benchmarks")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BEFORE", "AFTER"),
+        help="compare two result files instead of running",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sf, bl, app_main = load_app(args.data, args.scale)
+    register_benchmarks(sf, bl, app_main, args.report, args.start_date)
+    rows = len(bl.get_dataset().fed_df)
+    print("%d rows, %d repeats" % (rows, args.repeat))
+
+    results = {}
+    for name, func, setup in benchmarks:
+        if args.filter not in name:
+            continue
+        # The data functions print load times - keep the output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = time_call(func, args.repeat, setup)
+        print("%-48s %10.3f ms" % (name, results[name]["median_ms"]))
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump({"meta": run_meta(args, rows), "results": results}, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+    Measures how long the dashboard takes to start, normally and with fast
+    start (FED_FAST_START=1).
+
+    For each mode there are two breakdowns:
+      - import time of each module main.py imports, from python -X importtime.
+        Without fast start the data load shows up under business_logic.
+      - time from launching gunicorn (one worker) until it answers /health,
+        serves the page layout, answers /ready and draws the first chart.
+        The server's own fed_startup_seconds from /metrics are included.
+
+    Linux only.  Run from the repository root with the data in ./data:
+
+        python benchmarks/startup_time.py
+        python benchmarks/startup_time.py --modes fast --output startup.json
+
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+import load_test
+import run_benchmarks as rb
+import worker_memory
+
+modes = {"standard": "0", "fast": "1"}
+
+
+# Cumulative import time (ms) of each module main imports directly, slowest
+# first, and of main itself
+def import_breakdown(fast_start):
+    env = dict(os.environ, FED_FAST_START=fast_start)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    # Modules are listed after the modules they import, nested two spaces
+    # per level, so main's own imports are the depth 1 lines since the last
+    # depth 0 line before it
+    children = []
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0 and name == "main":
+            total = int(cumulative) / 1000
+            break
+        if depth == 0:
+            children = []
+        elif depth == 1:
+            children.append((name, int(cumulative) / 1000))
+    children.sort(key=lambda child: -child[1])
+    return {"main_ms": total, "modules_ms": dict(children)}
+
+
+# Seconds after start until url answers with a 200
+def wait_until(start, check, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return round(time.perf_counter() - start, 3)
+        time.sleep(0.02)
+    return None
+
+
+def serve_breakdown(fast_start, port, timeout):
+    env = dict(
+        os.environ,
+        FED_WORKERS="1",
+        FED_BIND="127.0.0.1:%d" % port,
+        FED_FAST_START=fast_start,
+    )
+    url = "http://127.0.0.1:%d" % port
+    client = load_test.HttpClient(url)
+    bodies = rb.session_callbacks("CPIAUCSL", "2020-01-01")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:server"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        times = {
+            "health": wait_until(
+                start,
+                lambda: worker_memory.wait_for_server(url + "/health", 0.1),
+                timeout,
+            ),
+            "page": wait_until(
+                start, lambda: client.post(bodies["display_page"]) == 200, timeout
+            ),
+            "ready": wait_until(
+                start,
+                lambda: worker_memory.wait_for_server(url + "/ready", 0.1),
+                timeout,
+            ),
+            "first_chart": wait_until(
+                start, lambda: client.post(bodies["basic_report"]) == 200, timeout
+            ),
+        }
+        with urllib.request.urlopen(url + "/metrics", timeout=10) as resp:
+            metrics = resp.read().decode()
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+
+    server = {}
+    for line in metrics.splitlines():
+        if line.startswith("fed_startup_seconds{"):
+            labels, value = line.split(" ")
+            server[labels.split('"')[1]] = round(float(value), 3)
+    return {"seconds_from_launch": times, "server_startup_seconds": server}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--modes", nargs="+", choices=list(modes), default=list(modes))
+    parser.add_argument("--port", type=int, default=8150)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        imports = import_breakdown(modes[mode])
+        serving = serve_breakdown(modes[mode], args.port, args.timeout)
+        results[mode] = {"imports": imports, "serving": serving}
+
+        print("%s - import main %.1f ms" % (mode, imports["main_ms"]))
+        for name, ms in imports["modules_ms"].items():
+            print("  %-32s %9.1f ms" % (name, ms))
+        print("  from launch (s): %s" % serving["seconds_from_launch"])
+        print("  server phases (s): %s" % serving["server_startup_seconds"])
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
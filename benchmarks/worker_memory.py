@@ -0,0 +1,132 @@
+"""
+    Measures startup time and memory of the production server as the
+    number of gunicorn workers grows.
+
+    For each worker count the server is started with gunicorn.conf.py,
+    timed until it answers a request, and then the memory of the master
+    and every worker is read from /proc.  RSS counts shared pages in every
+    process, so PSS (shared pages split between the processes sharing them)
+    is the better guide to what each extra worker really costs.
+
+    Linux only.  Run from the repository root with the data in ./data:
+
+        python benchmarks/worker_memory.py --workers 1 2 4 8
+
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+# Resident and proportional set size of a process in kB
+def process_memory(pid):
+    memory = {"rss_kb": 0, "pss_kb": 0}
+    try:
+        with open("/proc/%d/smaps_rollup" % pid) as smaps:
+            for line in smaps:
+                if line.startswith("Rss:"):
+                    memory["rss_kb"] = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    memory["pss_kb"] = int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return memory
+
+
+def child_pids(pid):
+    try:
+        with open("/proc/%d/task/%d/children" % (pid, pid)) as children:
+            return [int(child) for child in children.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def wait_for_server(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def measure(workers, port, timeout):
+    env = dict(
+        os.environ,
+        FED_WORKERS=str(workers),
+        FED_BIND="127.0.0.1:%d" % port,
+    )
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:server"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = "http://127.0.0.1:%d/" % port
+        if not wait_for_server(url, timeout):
+            raise RuntimeError("server with %d workers didn't start" % workers)
+        startup = time.perf_counter() - start
+
+        # Give every worker time to come up before reading memory
+        deadline = time.monotonic() + timeout
+        while len(child_pids(proc.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        master = process_memory(proc.pid)
+        worker_memory = [process_memory(pid) for pid in child_pids(proc.pid)]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+
+    return {
+        "workers": workers,
+        "startup_seconds": round(startup, 3),
+        "master_rss_kb": master["rss_kb"],
+        "master_pss_kb": master["pss_kb"],
+        "worker_rss_kb": [w["rss_kb"] for w in worker_memory],
+        "worker_pss_kb": [w["pss_kb"] for w in worker_memory],
+        "total_pss_kb": master["pss_kb"] + sum(w["pss_kb"] for w in worker_memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--port", type=int, default=8150)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        result = measure(workers, args.port, args.timeout)
+        results.append(result)
+        print(
+            "%2d workers: startup %.2fs, master RSS %d kB, worker RSS %s kB, "
+            "total PSS %d kB"
+            % (
+                workers,
+                result["startup_seconds"],
+                result["master_rss_kb"],
+                result["worker_rss_kb"],
+                result["total_pss_kb"],
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,31 +3,786 @@
 
     This is called by main.py and in turn calls support functions when needed
 
+    The data and everything derived from it lives in a Dataset snapshot.  A
+    background watcher rebuilds the snapshot when the data file changes and
+    swaps it in, so new data shows up without restarting the server.
+    Callbacks grab the current snapshot once and use it throughout, so a
+    reload mid-request can't mix old and new data.
+
+    Everything can also be drawn as of a past date - only the vintages
+    released by then are used.  An as_of of None means the latest data.
+
+    With fast_start the data isn't loaded at import.  The watcher loads it
+    in the background and get_dataset returns None until it's ready.
+
+    Once the watcher is running, every load and reload is followed by a
+    background warm-up that draws each report's charts ahead of time.
+
 """
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 import plotly.io as pio
 import support_functions as sf
+import metrics as mx
 
 pd.options.plotting.backend = "plotly"
 pio.templates.default = "plotly_dark"
 
-# Get data from CSV or other store and hold a master dataframe
-fed_df = sf.get_fed_data()
+# Dash writes callback responses through plotly's json encoder, so use
+# orjson for it when it's installed - it's several times faster
+if importlib.util.find_spec("orjson") is not None:
+    pio.json.config.default_engine = "orjson"
+
+# How often (seconds) the watcher checks the data file for changes
+reload_interval = 30
+
+# Fast start - load the data in the background instead of at import, so
+# the server answers health checks and serves the page (with a loading
+# state) straight away.  Handy for containers that scale up and down.
+# Under gunicorn each worker then loads its own copy of the data rather
+# than sharing the one the master loaded, so it costs memory.
+fast_start = os.environ.get("FED_FAST_START", "0") == "1"
+
+# How many prepared results to keep
+prepared_cache_entries = 256
+
+# The report and start date a new page opens with
+default_report = "CPIAUCSL"
+default_start_date = "2020-01-01"
+
+# Warm-up - after the data loads or reloads, the charts for every report
+# are drawn in the background at the default start date and any extra
+# start dates listed here, default report first.  It stops early once
+# either cache is warmup_cache_share full, leaving the rest for whatever
+# visitors ask for.  See warm_up.
+warmup_enabled = True
+warmup_start_dates = []
+warmup_cache_share = 0.75
+
+
+#############################################################################
+# Dataset snapshot
+#############################################################################
+# Everything derived from one load of the data.  Nothing here is modified
+# after it's built - a reload builds a new one.
+class Dataset:
+    def __init__(self, source, version, stamp):
+        start = time.perf_counter()
+        # Bumped on every reload
+        self.version = version
+        # Stamp of the data source this was built from (see get_fed_data_stamp)
+        self.stamp = stamp
+
+        # With the SQLite backend source is a store handle (see
+        # get_fed_source).  Only the latest vintages are loaded and each
+        # report's release history is queried from the store when a chart
+        # needs it - see get_report_releases.  Otherwise source is the
+        # master dataframe and everything is sliced out of it.
+        if isinstance(source, sf.ss.FedStore):
+            self.store = source
+            self.fed_df = None
+            self.fed_index = None
+            self.vintages = None
+            latest = sf.read_fed_latest(source)
+
+            # Content fingerprints from the store's per-report summary
+            summary = source.summary()
+            self.rows = int(summary["rows"].sum())
+            self.report_hashes = {
+                row.report_name: hash(
+                    (row.rows, row.last_release, row.hash_total, row.data_total)
+                )
+                for row in summary.itertuples(index=False)
+            }
+            if len(summary):
+                self.last_release = pd.Timestamp(summary["last_release"].max())
+            else:
+                self.last_release = None
+        else:
+            self.store = None
+
+            # Sort the master dataframe by report and index where each report
+            # lives so the callbacks can slice reports out without scanning
+            # the whole table
+            self.fed_df, self.fed_index = sf.build_report_index(source)
+            latest = sf.build_latest_data(self.fed_df)
+            self.rows = len(self.fed_df)
+
+            # Point-in-time lookups for the as-of views
+            self.vintages = sf.VintageIndex(self.fed_df)
+            if len(self.fed_df):
+                self.last_release = self.fed_df["release_date"].max()
+            else:
+                self.last_release = None
+
+            # Content fingerprints used in the cache keys.  Cached results
+            # for a report stay valid across reloads as long as its
+            # fingerprint (or its category's, for the surfaces) doesn't
+            # change.
+            self.report_hashes = sf.get_report_hashes(self.fed_df, self.fed_index)
+
+        # Latest vintage of every report / report_date, indexed the same way.
+        # The change charts and the category surfaces read from this instead
+        # of working out revisions on every request.
+        self.fed_latest, self.latest_index = sf.build_report_index(latest)
+
+        # Wide latest-vintage matrices for each category used by the 3D
+        # surfaces
+        self.category_cubes = sf.build_category_cubes(self.fed_latest)
+        self.category_hashes = {
+            category: hash(tuple(self.report_hashes.get(name) for name in cube.columns))
+            for category, cube in self.category_cubes.items()
+        }
+
+        #####################################################################
+        # Generate the report list
+        #####################################################################
+        # Populate a dataframe for the selctor.  The index holds the report
+        # names already sorted, as plain strings even in the compact layout.
+        fed_list = pd.DataFrame(list(self.latest_index), columns=["report_name"])
+        fed_list = sf.add_report_long_names(fed_list)
+        fed_list.sort_values(by=["report_long_name"], inplace=True)
+        self.fed_list = fed_list
+
+        # setup for drop down use
+        self.fed_list_abbrev = dict(
+            zip(fed_list["report_name"], fed_list["report_long_name"])
+        )
+
+        # How long building all of the above took
+        self.build_seconds = time.perf_counter() - start
+        # Filled in by memory_usage
+        self.memory = None
+
+    def report_hash(self, report):
+        return self.report_hashes.get(report)
+
+    # Bytes held by each part of the snapshot.  Counting the strings in
+    # object columns takes a pass over them, so it's worked out on first
+    # use and kept - the snapshot never changes.
+    def memory_usage(self):
+        if self.memory is None:
+            self.memory = {
+                "fed_df": 0
+                if self.fed_df is None
+                else int(self.fed_df.memory_usage(deep=True).sum()),
+                "fed_latest": int(self.fed_latest.memory_usage(deep=True).sum()),
+                "category_cubes": int(
+                    sum(
+                        cube.memory_usage(deep=True).sum()
+                        for cube in self.category_cubes.values()
+                    )
+                ),
+                "vintages": 0 if self.vintages is None else int(self.vintages.nbytes()),
+            }
+        return self.memory
+
+    # As-of dates on or after the last release are just the latest data, so
+    # they're folded into None and share its precomputed frames and caches
+    def normalize_as_of(self, as_of):
+        if as_of is None or self.last_release is None:
+            return None
+        as_of = pd.Timestamp(as_of).strftime("%Y-%m-%d")
+        if pd.Timestamp(as_of) >= self.last_release:
+            return None
+        return as_of
+
+    # Fingerprint of every report in the report's category
+    def category_hash(self, report):
+        return self.category_hashes.get(sf.rr.report_categories.get(report))
+
+    # Reports whose content differs from another snapshot
+    def changed_reports(self, other):
+        names = set(self.report_hashes) | set(other.report_hashes)
+        return {
+            name
+            for name in names
+            if self.report_hashes.get(name) != other.report_hashes.get(name)
+        }
+
+
+# The current snapshot - None until the first load (see fast_start)
+dataset = None
+reload_lock = threading.Lock()
+# perf_counter time the first snapshot was ready
+dataset_ready_at = None
+
+
+# The current snapshot.  Grab it once per request and pass it along.  While
+# the data is still loading this is None, and makes sure something is
+# loading it.
+def get_dataset():
+    if dataset is None:
+        start_watcher()
+    return dataset
+
 
 #############################################################################
-# Generate the report list
+# Reloading
 #############################################################################
-# Populate a dataframe for the selctor
-fed_list = fed_df["report_name"].unique()
-fed_list = np.sort(fed_list)
+# Rebuild the snapshot if the data file has changed and swap it in.  The
+# build happens off to the side so requests keep being served from the old
+# snapshot until the new one is ready.  Only cached results for reports
+# whose data changed, and the category surfaces they're part of, are thrown
+# away.  Returns the set of changed reports.  With no snapshot yet this is
+# the first load.  Either way the new snapshot is warmed up unless warm is
+# False.
+def reload_data(force=False, warm=True):
+    global dataset, dataset_ready_at
+    with reload_lock:
+        old = dataset
+        stamp = sf.get_fed_data_stamp()
+        if old is not None and not force and stamp == old.stamp:
+            return set()
+
+        if old is None:
+            dataset = Dataset(sf.get_fed_source(), 1, stamp)
+            dataset_ready_at = time.perf_counter()
+            if warm:
+                start_warmup(dataset)
+            return set(dataset.report_hashes)
+
+        new = Dataset(sf.get_fed_source(), old.version + 1, stamp)
+        changed = new.changed_reports(old)
+        dataset = new
+
+    # Category surfaces are cached under the category name
+    stale = changed | {
+        sf.rr.report_categories[name]
+        for name in changed
+        if name in sf.rr.report_categories
+    }
+    prepared_cache.invalidate(stale)
+    sf.figure_cache.invalidate(stale)
+    if warm:
+        start_warmup(new)
+
+    print(
+        "Reloaded data as version %d - %d reports changed" % (new.version, len(changed))
+    )
+    return changed
+
+
+# Checks for new data every interval seconds.  With nothing loaded yet
+# (fast start) the first check runs straight away.
+def watch_data(interval):
+    while True:
+        if dataset is not None:
+            time.sleep(interval)
+        try:
+            reload_data()
+        except Exception as error:
+            # Keep serving the old snapshot and try again next time
+            print("Data reload failed: " + repr(error))
+            if dataset is None:
+                time.sleep(interval)
+
+
+watcher = None
+watcher_lock = threading.Lock()
+
+
+# Start the background watcher, once per process.  Under gunicorn this has
+# to happen in each worker after the fork since threads don't survive it.
+# Data that's already loaded gets warmed up now that it's safe to start
+# threads.  With fast start every callback on the first page load asks for
+# the data at once, so the check and the start go under a lock.
+def start_watcher(interval=None):
+    global watcher
+    with watcher_lock:
+        if watcher is None or not watcher.is_alive():
+            watcher = threading.Thread(
+                target=watch_data,
+                args=(interval or reload_interval,),
+                name="data-watcher",
+                daemon=True,
+            )
+            watcher.start()
+            if dataset is not None:
+                start_warmup(dataset)
+        return watcher
+
+
+# Get data from CSV or other store and build the first snapshot, unless
+# it's being left to the watcher.  No warm-up thread yet - under gunicorn
+# this runs in the master and a thread running through the fork could
+# leave the workers with a held lock.
+if not fast_start:
+    reload_data(warm=False)
+
+
+#############################################################################
+# Prepared data shared by the callbacks
+#############################################################################
+# All the chart callbacks fire on the same report / start-date inputs and
+# need the same filtered frames.  These are computed once per
+# (report, start date, content fingerprint) and shared.  Each key being
+# built gets its own lock, so callbacks that fire together for the same
+# data wait for the first one instead of all doing the work, while builds
+# for other keys carry on.  prepare_lock only guards the dicts.  The frames
+# handed out are shared - copy before modifying.
+prepare_lock = threading.Lock()
+
+
+# Small LRU keyed on (kind, report, ...) tuples so a reload can drop just
+# the changed reports.  Category data has the category name in place of
+# the report.
+class PreparedCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.building = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, build):
+        found, value = self.lookup(key)
+        if found:
+            return value
+        with prepare_lock:
+            key_lock = self.building.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Someone else may have built it while we waited
+            found, value = self.lookup(key, count_miss=True)
+            if found:
+                return value
+            try:
+                value = build()
+                with prepare_lock:
+                    self.entries[key] = value
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                        self.evictions += 1
+            finally:
+                with prepare_lock:
+                    if self.building.get(key) is key_lock:
+                        del self.building[key]
+            return value
+
+    # (found, value) for the key, counting hits (and misses if asked)
+    def lookup(self, key, count_miss=False):
+        with prepare_lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+            if count_miss:
+                self.misses += 1
+            return False, None
+
+    def invalidate(self, reports):
+        with prepare_lock:
+            for key in [key for key in self.entries if key[1] in reports]:
+                del self.entries[key]
+
+    def clear(self):
+        with prepare_lock:
+            self.entries.clear()
+
+    # Read without the lock so a metrics scrape never waits on a build
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+prepared_cache = PreparedCache(prepared_cache_entries)
+
+
+@mx.timed_stage
+def prepare_report_data(data, report, start_date, as_of):
+    # Every release after the start date for the raw chart
+    raw = get_report_releases(data, report, start_date, as_of)
+    raw = sf.add_report_long_names(raw)
+
+    return {
+        "long_name": sf.rr.report_long_names.get(report, report),
+        "raw": raw,
+    }
+
+
+# Every release of a report with report and release dates from start_date
+# on, as known as of a date.  With the SQLite backend the filter runs in the
+# store and only this slice is loaded.
+def get_report_releases(data, report, start_date=None, as_of=None):
+    if data.store is not None:
+        return sf.select_fed_data(
+            data.store,
+            report_name=report,
+            after_report_date=start_date,
+            after_release_date=start_date,
+            until_release_date=as_of,
+        )
+    df = sf.get_report_from_index(data.fed_df, data.fed_index, report)
+    if start_date is not None:
+        df = sf.get_sorted_report_after_date(df, start_date)
+        df = sf.get_sorted_release_after_date(df, start_date)
+    if as_of is not None:
+        df = sf.get_release_as_of_date(df, as_of)
+    return df
+
+
+# Latest vintage of every report_date known as of a date
+def get_latest_report(data, report, as_of):
+    if as_of is None:
+        return sf.get_report_from_index(data.fed_latest, data.latest_index, report)
+    if data.store is not None:
+        return sf.get_latest_from_store(
+            data.store, report_name=report, until_release_date=as_of
+        )
+    return data.vintages.as_of(as_of, report)
+
+
+@mx.timed_stage
+def prepare_category_data(data, report, start_date, as_of):
+    category, cube = sf.get_category_cube(
+        get_category_cubes(data, as_of), report, start_date
+    )
+    return {
+        "category": category,
+        "period": sf.category_period_change(cube),
+        "baseline": sf.category_relative_change(cube),
+    }
+
+
+# Category cubes as known on a date
+def get_category_cubes(data, as_of):
+    if as_of is None:
+        return data.category_cubes
+    return prepared_cache.get_or_build(
+        ("cubes", None, data.version, as_of),
+        lambda: sf.build_category_cubes(get_latest_data(data, as_of)),
+    )
+
+
+# Latest vintage of every report as known on a date
+def get_latest_data(data, as_of):
+    if data.store is not None:
+        return sf.get_latest_from_store(data.store, until_release_date=as_of)
+    return data.vintages.as_of(as_of)
+
+
+# Trendline through the raw data for the basic chart
+@mx.timed_stage
+def prepare_trendline(data, report, start_date, as_of, method, bandwidth):
+    raw = get_prepared_report(report, start_date, data, as_of)["raw"]
+    return sf.smooth_trendline(
+        raw["report_date"].values,
+        raw["report_data"].values,
+        method=method,
+        bandwidth=bandwidth,
+    )
+
+
+# A report's whole latest vintage series plus empty change chart layouts for
+# drawing the change charts in the browser.  Values are plain lists so they
+# go straight into the dcc.Store.
+@mx.timed_stage
+def prepare_report_series(data, report, as_of):
+    df = get_latest_report(data, report, as_of)
+    long_name = sf.rr.report_long_names.get(report, report)
+    values = df["report_data"].astype(object).where(df["report_data"].notna(), None)
+
+    empty = pd.DataFrame(
+        {
+            "report_date": np.array([], dtype="datetime64[ns]"),
+            "relative_change": np.array([], dtype="float64"),
+            "period_change": np.array([], dtype="float64"),
+        }
+    )
+    baseline = sf.baseline_change_chart(empty, long_name)
+    period = sf.periodic_change_chart(empty, long_name)
+
+    return {
+        "report": report,
+        "long_name": long_name,
+        "dates": sf.compact_dates(df["report_date"]).tolist(),
+        "values": values.tolist(),
+        "point_budget": sf.chart_point_budget,
+        "webgl_threshold": sf.webgl_point_threshold,
+        "layouts": {
+            "baseline": baseline.to_plotly_json()["layout"],
+            "period": period.to_plotly_json()["layout"],
+        },
+    }
+
+
+# These all work off the given snapshot, or the current one if none is given
+def get_prepared_report(report, start_date, data=None, as_of=None):
+    data = data or get_dataset()
+    as_of = data.normalize_as_of(as_of)
+    return prepared_cache.get_or_build(
+        ("report", report, start_date, data.report_hash(report), as_of),
+        lambda: prepare_report_data(data, report, start_date, as_of),
+    )
+
+
+# Shared by every report in the category
+def get_prepared_category(report, start_date, data=None, as_of=None):
+    data = data or get_dataset()
+    as_of = data.normalize_as_of(as_of)
+    category = sf.rr.report_categories.get(report)
+    return prepared_cache.get_or_build(
+        ("category", category, start_date, data.category_hash(report), as_of),
+        lambda: prepare_category_data(data, report, start_date, as_of),
+    )
+
+
+def get_report_series(report, data=None, as_of=None):
+    data = data or get_dataset()
+    as_of = data.normalize_as_of(as_of)
+    return prepared_cache.get_or_build(
+        ("series", report, data.report_hash(report), as_of),
+        lambda: prepare_report_series(data, report, as_of),
+    )
+
+
+def get_trendline(
+    report, start_date, method=None, bandwidth=None, data=None, as_of=None
+):
+    data = data or get_dataset()
+    as_of = data.normalize_as_of(as_of)
+    if method is None:
+        method = sf.trendline_method
+    if bandwidth is None:
+        bandwidth = sf.trendline_bandwidth
+    return prepared_cache.get_or_build(
+        (
+            "trend",
+            report,
+            start_date,
+            data.report_hash(report),
+            as_of,
+            method,
+            bandwidth,
+        ),
+        lambda: prepare_trendline(data, report, start_date, as_of, method, bandwidth),
+    )
+
+
+# A report's values as known on each of many dates - see
+# VintageIndex.as_of_matrix.  For backtesting.  With the SQLite backend the
+# index is built over just this report's releases.
+def get_as_of_matrix(report, as_of_dates, data=None):
+    data = data or get_dataset()
+    if data.store is not None:
+        vintages = sf.VintageIndex(get_report_releases(data, report))
+        return vintages.as_of_matrix(report, as_of_dates)
+    return data.vintages.as_of_matrix(report, as_of_dates)
+
+
+#############################################################################
+# Charts
+#############################################################################
+# Builders for each chart off the prepared data.  Callbacks go through
+# get_chart so repeat requests come straight out of the figure cache.
+# The basic chart takes an optional (start, end) window when it has been
+# zoomed and is downsampled to the point budget.
+def build_basic_chart(data, report, start_date, as_of=None, window=None):
+    prepared = get_prepared_report(report, start_date, data, as_of)
+    trend = get_trendline(report, start_date, data=data, as_of=as_of)
+    df = sf.downsample_frame(
+        prepared["raw"], "report_date", "report_data", window=window
+    )
+    fig = sf.basic_chart(
+        df, prepared["long_name"], trend, webgl=len(df) > sf.webgl_point_threshold
+    )
+    return zoom_chart(fig, window)
+
+
+# Keep the chart showing the zoomed window
+def zoom_chart(fig, window):
+    if window is not None:
+        fig.update_layout(xaxis_range=list(window))
+    return fig
+
+
+def build_category_period_chart(data, report, start_date, as_of=None):
+    prepared = get_prepared_category(report, start_date, data, as_of)
+    return sf.category_chart_perodic(prepared["period"], prepared["category"])
+
+
+def build_category_baseline_chart(data, report, start_date, as_of=None):
+    prepared = get_prepared_category(report, start_date, data, as_of)
+    return sf.category_chart_baseline(prepared["baseline"], prepared["category"])
+
+
+chart_builders = {
+    "basic": build_basic_chart,
+    "category_period": build_category_period_chart,
+    "category_baseline": build_category_baseline_chart,
+}
+
+# Charts drawn from the whole category rather than one report
+category_charts = {"category_period", "category_baseline"}
+
+
+# Zoomed windows are built fresh each time rather than filling the cache
+# with one-off ranges.  Figures are cached against the data fingerprint and
+# the as-of date together.  Category charts are the same for every report
+# in the category so they're cached once under the category name.
+def get_chart(chart_type, report, start_date, window=None, data=None, as_of=None):
+    data = data or get_dataset()
+    as_of = data.normalize_as_of(as_of)
+    if window is not None:
+        return chart_builders[chart_type](data, report, start_date, as_of, window)
+    if chart_type in category_charts:
+        name = sf.rr.report_categories.get(report)
+        version = (data.category_hash(report), as_of)
+    else:
+        name = report
+        version = (data.report_hash(report), as_of)
+    return sf.figure_cache.get_or_build(
+        chart_type,
+        name,
+        start_date,
+        version,
+        lambda: chart_builders[chart_type](data, report, start_date, as_of),
+    )
+
+
+#############################################################################
+# Warm-up
+#############################################################################
+# Draws the charts for every report ahead of time so the first visitor
+# after a deploy or reload gets them from the cache.  The default report
+# goes first, then the rest in dropdown order.  Live requests take
+# priority - main.py counts them in and out with request_started and
+# request_finished, and the warm-up waits while any are running.  It stops
+# if a newer snapshot is swapped in (that one gets its own warm-up) or once
+# the caches are full enough (warmup_cache_share), so it never pushes out
+# what visitors are using.  Progress is kept in warmup_status and shown on
+# /metrics.
+active_requests = 0
+active_lock = threading.Lock()
+
+warmup_status = {
+    "version": None,
+    "state": "idle",
+    "total": 0,
+    "done": 0,
+    "failed": 0,
+    "seconds": 0.0,
+}
+
+
+def request_started():
+    global active_requests
+    with active_lock:
+        active_requests += 1
+
+
+def request_finished():
+    global active_requests
+    with active_lock:
+        active_requests -= 1
+
+
+def start_warmup(data):
+    if not warmup_enabled:
+        return None
+    thread = threading.Thread(target=warm_up, args=(data,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+# Everything to draw, in order - (chart type, report, start date).  "series"
+# is the report series the browser draws the change charts from.  The
+# category charts are drawn once per category, with its first report.
+def warmup_plan(data):
+    reports = list(data.fed_list_abbrev)
+    if default_report in data.fed_list_abbrev:
+        reports.remove(default_report)
+        reports.insert(0, default_report)
+    start_dates = [default_start_date] + [
+        start_date
+        for start_date in warmup_start_dates
+        if start_date != default_start_date
+    ]
+
+    plan = []
+    for start_date in start_dates:
+        planned = set()
+        for report in reports:
+            plan.append(("basic", report, start_date))
+            category = sf.rr.report_categories.get(report)
+            if category in data.category_cubes and category not in planned:
+                planned.add(category)
+                plan.append(("category_period", report, start_date))
+                plan.append(("category_baseline", report, start_date))
+            if start_date == default_start_date:
+                plan.append(("series", report, None))
+    # The default report's other start dates come before everyone else's
+    return sorted(plan, key=lambda item: item[1] != default_report)
+
+
+def caches_full():
+    share = warmup_cache_share
+    figures = sf.figure_cache.stats()
+    return (
+        len(prepared_cache.entries) >= prepared_cache.max_entries * share
+        or figures["entries"] >= sf.figure_cache.max_entries * share
+        or figures["bytes"] >= sf.figure_cache.max_bytes * share
+    )
+
+
+# Wait for live requests to finish.  False if the snapshot has been
+# replaced in the meantime.
+def wait_for_idle(data):
+    while active_requests > 0 and dataset is data:
+        time.sleep(0.005)
+    return dataset is data
+
+
+def warm_up(data):
+    global warmup_status
+    plan = warmup_plan(data)
+    status = {
+        "version": data.version,
+        "state": "running",
+        "total": len(plan),
+        "done": 0,
+        "failed": 0,
+        "seconds": 0.0,
+    }
+    warmup_status = status
+    start = time.perf_counter()
 
-fed_list = pd.DataFrame(fed_list, columns=["report_name"])
-fed_list = sf.add_report_long_names(fed_list)
-fed_list.sort_values(by=["report_long_name"], inplace=True)
+    for chart_type, report, start_date in plan:
+        if not wait_for_idle(data):
+            status["state"] = "replaced"
+            break
+        if caches_full():
+            status["state"] = "cache full"
+            break
+        try:
+            if chart_type == "series":
+                get_report_series(report, data)
+            else:
+                get_chart(chart_type, report, start_date, data=data)
+            status["done"] += 1
+        except Exception as error:
+            status["failed"] += 1
+            print("Warm-up of %s %s failed: %r" % (chart_type, report, error))
+        status["seconds"] = time.perf_counter() - start
+    else:
+        status["state"] = "done"
 
-# setup for drop down use
-fed_list_abbrev = dict(zip(fed_list["report_name"], fed_list["report_long_name"]))
+    print(
+        "Warm-up of version %d %s - %d of %d charts in %.1fs"
+        % (data.version, status["state"], status["done"], len(plan), status["seconds"])
+    )
+    return status
 
 
 #############################################################################
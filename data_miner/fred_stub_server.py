@@ -0,0 +1,151 @@
+"""
+  A small local stand-in for the FRED series/observations endpoint.
+
+  It makes up a few years of monthly observations with a handful of
+  vintages each for any series id it's asked about, and can be told to
+  misbehave so the downloader's retries and rate limiting can be exercised
+  without an API key or a network connection.
+
+  Usage:
+   - python fred_stub_server.py --port 8999
+   - python pull_fed_data.py --full --base-url http://127.0.0.1:8999/fred/
+
+  Series ids starting with "BAD" get a 400 like an unknown series would.
+"""
+
+import argparse
+import json
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Shape of the made up data
+stub_start_year = 2015
+stub_years = 7
+stub_vintages = 3
+
+
+# Made up observations for a series.  Values are seeded from the series id
+# so every run serves the same data.
+def make_observations(series_id):
+    seed = zlib.crc32(series_id.encode())
+    observations = []
+    level = 100.0 + seed % 100
+    for month in range(stub_years * 12):
+        report_date = date(stub_start_year + month // 12, month % 12 + 1, 1)
+        level += ((seed >> (month % 24)) % 7 - 3) / 2
+        for vintage in range(stub_vintages):
+            start = report_date + timedelta(days=30 * (vintage + 1))
+            end = report_date + timedelta(days=30 * (vintage + 2) - 1)
+            if vintage == stub_vintages - 1:
+                end = date(9999, 12, 31)
+            observations.append(
+                {
+                    "realtime_start": start.isoformat(),
+                    "realtime_end": end.isoformat(),
+                    "date": report_date.isoformat(),
+                    "value": "%.1f" % (level + vintage / 10),
+                }
+            )
+    return observations
+
+
+# Clip vintages to the requested window the same way FRED does
+def clip_observations(observations, realtime_start):
+    clipped = []
+    for row in observations:
+        if row["realtime_end"] < realtime_start:
+            continue
+        row = dict(row)
+        row["realtime_start"] = max(row["realtime_start"], realtime_start)
+        clipped.append(row)
+    return clipped
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Set from the command line
+    fail_every = 0
+    latency = 0.0
+    counter = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        with StubHandler.lock:
+            StubHandler.counter += 1
+            count = StubHandler.counter
+        time.sleep(self.latency)
+
+        if not url.path.endswith("/series/observations"):
+            return self.reply(404, {"error_message": "Unknown endpoint"})
+        if "api_key" not in params:
+            return self.reply(400, {"error_message": "Missing api_key"})
+        if self.fail_every and count % self.fail_every == 0:
+            # Alternate between rate limiting and a server error
+            if count // self.fail_every % 2:
+                return self.reply(429, {"error_message": "Too Many Requests"})
+            return self.reply(500, {"error_message": "Internal Server Error"})
+
+        series_id = params.get("series_id", "")
+        if series_id.startswith("BAD"):
+            return self.reply(400, {"error_message": "The series does not exist."})
+
+        observations = clip_observations(
+            make_observations(series_id), params.get("realtime_start", "1776-07-04")
+        )
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100000))
+        self.reply(
+            200,
+            {
+                "realtime_start": params.get("realtime_start"),
+                "count": len(observations),
+                "offset": offset,
+                "limit": limit,
+                "observations": observations[offset : offset + limit],
+            },
+        )
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the FRED api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=0,
+        help="answer every Nth request with a 429 or 500",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds to wait per request"
+    )
+    args = parser.parse_args()
+
+    StubHandler.fail_every = args.fail_every
+    StubHandler.latency = args.latency
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print("FRED stub listening on http://%s:%d/fred/" % (args.host, args.port))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,105 +2,407 @@
   This is a basic data downloader to obtain report data from the federal
   reserve's FRED system.
 
-  The full_fred module does the heavy lifting.
-  Read up on it at https://github.com/7astro7/full_fred
+  Series are pulled straight from the FRED series/observations endpoint.
+  Read up on it at https://fred.stlouisfed.org/docs/api/fred/
 
   Follow the instructions:
-   - pip install full-fred
    - set up your api key file
    - set the full path the api key file
    - set up the output path
    - Boom! Bob's your uncle (i.e., you're good to go)
+
+  By default only vintages newer than what's already in the dump are pulled
+  and merged in.  Run with --full to rebuild the dump from scratch.
+
+  Series are downloaded on a small pool of worker threads.  Requests are
+  rate limited to stay under FRED's per-key limit and transient failures
+  are retried with exponential backoff.  A per-series summary of rows,
+  latency, retries and failures is written next to the dump.
+
+  With --sqlite the new and changed rows are also upserted into the local
+  SQLite store the dashboard can read from (see sqlite_store.py).
+
+  To try it out without an API key or network, start fred_stub_server.py
+  and point --base-url at it.
 """
 
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from full_fred.fred import Fred
+
+# The report registry lives with the dashboard code one level up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import report_registry as rr
+import sqlite_store as ss
 
 output_file = "../data/fed_dump.csv"
 
+# Per-series results from the last run
+result_file = "../data/pull_report.csv"
+
+# SQLite store to upsert into when run with --sqlite
+sqlite_file = "../data/fed_dump.sqlite"
+
 # path to the api key file
 # this is just a bare text file that only contains the api key
-fred = Fred("fed_api_key.txt")
-
-# list of reports to obtain
-report_list = [
-    "WM1NS",  # M1 Supply
-    "WM2NS",  # M2 Supply
-    "ICSA",  # Unemployment
-    "CCSA",  # Continued Unemployment
-    "JTSJOL",  # Job Openings: Total Nonfarm
-    "JTSQUL",  # Job Quits: Total Nonfarm
-    "PAYEMS",  # Non-Farm Employment
-    "NPPTTL",  # Total Nonfarm Private Payroll Employment (ADP)
-    "RSXFS",  # Retail Sales
-    "TCU",  # Capacity Utilization
-    "UMCSENT",  # Consumer Sentiment Index
-    "BUSINV",  # Business Inventories
-    "INDPRO",  # Industrial Production Index
-    "IPG331S",  # Primary Metal Production
-    "IPG332S",  # Fabricated Metal Products
-    "IPG334S",  # Computer and Electronic Products
-    "IPG335S",  # Electrical Equipment, Appliance, and Component
-    "IPG3361T3S",  # Motor Vehicles and Parts
-    "IPMINE",  # Mining, Quarrying, and Oil and Gas Extraction
-    "GACDFSA066MSFRBPHI",  # Philidelphia Fed Manufacturing Index
-    "GACDISA066MSFRBNY",  # Empire State Manufacturing Index
-    "IR",  # Import Price Index
-    "IQ",  # Export Price Index
-    "PPIACO",  # Producer Price Index - all
-    "PCUOMINOMIN",  # Producer Price Index Mining
-    "CPIAUCSL",  # Consumer Price Index - all
-    "CPILFESL",  # Consumer Price Index (Core)
-    "MICH",  # University of Michigan: Inflation Expectation
-    "AMDMUO",  # Manufacturers Unfilled Orders: Durable Goods
-    "AMTMUO",  # Manufacturers Unfilled Orders: Total Manufacturing
-    "ANXAUO",  # Manufacturers Unfilled Orders: Nondefense Capital Goods Excluding Aircraft
-    "AMVPUO",  # Manufacturers Unfilled Orders: Motor Vehicles and Parts
-    "BACTSAMFRBDAL",  # Current General Business Activity; Diffusion Index for Texas
-    "IPB53122S",  # Industrial Production: Durable Goods Materials: Semiconductors, Printed Circuit Boards, and Other
-    "IPG3254N",  # Industrial Production: Manufacturing: Non-Durable Goods: Pharmaceutical and Medicine
-    "IPDMAN",  # Industrial Production: Durable Manufacturing
-    "IPFINAL",  # Industrial Production: Final Products
-    "CSCICP03USM665S",  # Consumer Opinion Surveys: Confidence Indicators: Composite Indicators: OECD Indicator for the United States
-    "MNFCTRIRSA",  # Manufacturers: Inventories to Sales Ratio
-    "DGORDER",  # Manufacturers' New Orders: Durable Goods
-    "NEWORDER",  # Manufacturers' New Orders: Nondefense Capital Goods Excluding Aircraft
-]
-
-# Logic to get the reports and process for ingestion
-def get_report(report_name):
+api_key_file = "fed_api_key.txt"
+
+# FRED api location - override with --base-url to use a local stub server
+fred_base_url = "https://api.stlouisfed.org/fred/"
+
+# Download tuning.  FRED allows 120 requests a minute per api key.
+fetch_workers = 4
+requests_per_minute = 120
+request_burst = 4
+max_retries = 4
+backoff_seconds = 1.0
+request_timeout = 60
+
+# Largest page FRED will return for series/observations
+page_limit = 100000
+
+# list of reports to obtain - maintained in report_registry.py alongside the
+# long names and categories the dashboard uses
+report_list = rr.report_list
+
+# Earliest vintage to pull when a series has nothing stored yet
+full_start = "2000-01-01"
+
+# Columns in the stored dump
+store_columns = ["release_date", "report_date", "data", "report_name", "hash"]
+
+# Columns that identify a row and the ones its content hash covers
+key_columns = ["report_name", "report_date", "release_date"]
+hash_columns = key_columns + ["data"]
+
+
+#############################################################################
+# FRED client
+#############################################################################
+# Simple thread safe token bucket.  take() blocks until a request is allowed.
+class TokenBucket:
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Errors worth another try - rate limiting, server trouble and the network
+def is_transient(error):
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (urllib.error.URLError, OSError, ValueError))
+
+
+class FredClient:
+    def __init__(
+        self,
+        api_key,
+        base_url=fred_base_url,
+        per_minute=requests_per_minute,
+        burst=request_burst,
+        retries=max_retries,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/") + "/"
+        self.bucket = TokenBucket(per_minute, burst)
+        self.retries = retries
+
+    # One rate limited GET with retries.  Returns the decoded json and the
+    # number of retries it took.
+    def request(self, endpoint, params):
+        params = dict(params, api_key=self.api_key, file_type="json")
+        url = self.base_url + endpoint + "?" + urllib.parse.urlencode(params)
+
+        attempt = 0
+        while True:
+            self.bucket.take()
+            try:
+                with urllib.request.urlopen(url, timeout=request_timeout) as resp:
+                    return json.loads(resp.read()), attempt
+            except Exception as error:
+                if attempt >= self.retries or not is_transient(error):
+                    error.retries = attempt
+                    raise
+                # Honour Retry-After on 429s, otherwise back off exponentially
+                delay = backoff_seconds * 2**attempt
+                if isinstance(error, urllib.error.HTTPError):
+                    retry_after = error.headers.get("Retry-After")
+                    if retry_after and retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                time.sleep(delay * (1 + random.random() / 2))
+                attempt += 1
+
+    # Every vintage of a series from realtime_start on, following pages
+    def get_observations(self, report_name, realtime_start):
+        observations = []
+        retries = 0
+        while True:
+            data, tries = self.request(
+                "series/observations",
+                {
+                    "series_id": report_name,
+                    "realtime_start": realtime_start,
+                    "limit": page_limit,
+                    "offset": len(observations),
+                },
+            )
+            retries += tries
+            page = data.get("observations", [])
+            observations.extend(page)
+            if not page or len(observations) >= int(data.get("count", 0)):
+                return observations, retries
+
+
+#############################################################################
+# Download
+#############################################################################
+# Logic to get a report and process it for ingestion.  Returns the frame and
+# a summary row for the result report.
+def get_report(client, report_name, realtime_start=full_start):
+    start = time.perf_counter()
+    result = {"report_name": report_name, "realtime_start": realtime_start}
     try:
-        df = fred.get_series_df(report_name, realtime_start="2000-01-01")
+        observations, retries = client.get_observations(report_name, realtime_start)
+        df = pd.DataFrame(
+            observations, columns=["realtime_start", "realtime_end", "date", "value"]
+        )
         df.rename(
             columns={
                 "realtime_start": "release_date",
                 "value": "data",
                 "date": "report_date",
-                "report": "report_name",
             },
             inplace=True,
         )
         df = df.drop(columns="realtime_end")
         df["report_name"] = report_name
-    except:
+        result.update(rows=len(df), retries=retries, error="")
+    except Exception as error:
         df = pd.DataFrame(
             columns=["release_date", "report_date", "data", "report_name"]
         )
-        print(report_name + " Empty Set")
+        result.update(rows=0, retries=getattr(error, "retries", 0), error=repr(error))
+        print(report_name + " failed: " + repr(error))
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return df, result
+
+
+# Pull a set of reports concurrently.  starts maps each report to the
+# realtime_start to request from.  Returns the combined frame and one
+# result row per report.
+def get_reports(client, starts, workers=fetch_workers):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pulled = list(
+            pool.map(lambda i: get_report(client, i, starts[i]), list(starts))
+        )
+
+    df = pd.concat([df1 for df1, _ in pulled], ignore_index=True)
+    results = pd.DataFrame([result for _, result in pulled])
+    return df, results
+
+
+# Stable content hash of the given columns for every row.  This uses pandas'
+# vectorized hashing with its fixed default key, so the same row hashes the
+# same in every run and on every machine (unlike Python's hash()).  Stored
+# as int64 so it round trips through the CSV untouched.
+def hash_rows(df, columns):
+    hashed = pd.util.hash_pandas_object(df[columns], index=False)
+    return hashed.values.view("int64")
+
+
+# Make the raw pull match the stored layout
+def clean_reports(df):
+    df = df.copy()
+    # Make sure all data is numeric
+    df.data = pd.to_numeric(df.data, errors="coerce").fillna(0).astype("float")
+    df["hash"] = hash_rows(df, hash_columns)
+    return df[store_columns]
+
+
+#############################################################################
+# Store
+#############################################################################
+# Read what we already have.  Dates stay as ISO strings, the same as they
+# come back from FRED.  Hashes are recomputed so dumps written with the old
+# per-process hash() line up with new pulls.
+def load_store(file_path):
+    if not os.path.exists(file_path):
+        return pd.DataFrame(columns=store_columns)
+    df = pd.read_csv(file_path, dtype={"release_date": str, "report_date": str})
+    df["hash"] = hash_rows(df, hash_columns)
     return df
 
 
-# Pull all the reports into a big honking dataframe
-all_rep = []
-for i in report_list:
-    df1 = get_report(i)
-    all_rep.append(df1)
+# Write the store to a temp file and swap it in so the dashboard never
+# reads a half written file
+def write_store(df, file_path):
+    tmp_path = file_path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+
+
+# Pull every report from scratch.  Reports that fail keep whatever we had
+# stored for them rather than vanishing from the dump.
+def full_pull(client, store, workers=fetch_workers):
+    df, results = get_reports(
+        client, {i: full_start for i in report_list}, workers=workers
+    )
+    df = clean_reports(df)
+
+    failed = results.loc[results["error"] != "", "report_name"]
+    kept = store[store["report_name"].isin(failed)]
+
+    return pd.concat([df, kept], ignore_index=True), results
+
+
+# Pull only vintages released since the latest one stored for each report.
+# FRED clips vintages to the requested window, so vintages that were still
+# current at the start come back stamped with that date.  Rows whose value
+# matches what we already have as the latest are dropped so only real
+# revisions and new observations get added.
+def incremental_pull(client, store, workers=fetch_workers):
+    latest_release = store.groupby("report_name")["release_date"].max()
+
+    starts = {i: latest_release.get(i, full_start) for i in report_list}
+    delta, results = get_reports(client, starts, workers=workers)
+    delta = clean_reports(delta)
+
+    current = store.sort_values("release_date")
+    current = current.drop_duplicates(["report_name", "report_date"], keep="last")
+    delta = delta.merge(
+        current[["report_name", "report_date", "data"]],
+        on=["report_name", "report_date"],
+        how="left",
+        suffixes=("", "_stored"),
+    )
+    delta = delta[delta["data"] != delta["data_stored"]]
+
+    return delta[store_columns], results
+
+
+# Upsert new rows into what's stored, keyed on the row hash.  Rows we
+# already have are skipped with a single isin, so re-pulling the same
+# vintages costs next to nothing.  A row with the same report, report_date
+# and release_date but a different value replaces the stored one.
+# Returns the merged store and the rows that were actually added.
+def merge_delta(store, delta):
+    delta = delta[~delta["hash"].isin(store["hash"])]
+    delta = delta.drop_duplicates("hash", keep="last")
+    if delta.empty:
+        return store, delta
+
+    replaced = np.isin(hash_rows(store, key_columns), hash_rows(delta, key_columns))
+    df = pd.concat([store[~replaced], delta], ignore_index=True)
+    return df, delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download FRED report data")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="re-download every report from scratch and rewrite the dump",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=fetch_workers,
+        help="number of series to download at once",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=requests_per_minute,
+        help="maximum requests per minute",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=max_retries,
+        help="retries per request for transient errors",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=fred_base_url,
+        help="FRED api location, e.g. a local fred_stub_server.py",
+    )
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const=sqlite_file,
+        help="also upsert into a SQLite store (default %s)" % sqlite_file,
+    )
+    args = parser.parse_args()
+
+    with open(api_key_file) as key_file:
+        api_key = key_file.read().strip()
+    client = FredClient(
+        api_key,
+        base_url=args.base_url,
+        per_minute=args.rate,
+        retries=args.retries,
+    )
+
+    store = load_store(output_file)
+    if args.full or store.empty:
+        df, results = full_pull(client, store, workers=args.workers)
+        delta = df
+        print("Full pull: %d rows" % len(df))
+    else:
+        delta, results = incremental_pull(client, store, workers=args.workers)
+        df, delta = merge_delta(store, delta)
+        print("Incremental pull: %d new rows" % len(delta))
+
+    # output to file.  With nothing new the file is left alone so its
+    # modified time doesn't set off a reload in the dashboard.
+    if delta.empty:
+        print("No new rows - %s left unchanged" % output_file)
+    else:
+        write_store(df, output_file)
+
+    # A new SQLite store gets everything, otherwise just what changed
+    if args.sqlite:
+        if not os.path.exists(args.sqlite) or ss.count_rows(args.sqlite) == 0:
+            delta = df
+        if delta.empty:
+            print("SQLite store: no rows to upsert")
+        else:
+            upserted = ss.upsert_rows(args.sqlite, delta)
+            print("SQLite store: %d rows upserted" % upserted)
+
+    results.to_csv(result_file, index=False)
+    print(results.to_string(index=False))
+    failures = (results["error"] != "").sum()
+    if failures:
+        print("%d of %d reports failed" % (failures, len(results)))
 
-df = pd.concat(all_rep)
-df["hash"] = df.apply(lambda x: hash(tuple(x)), axis=1)
-# Make sure all data is numeric
-df.data = pd.to_numeric(df.data, errors="coerce").fillna(0).astype("float")
 
-# output to file
-df.to_csv(output_file, index=False)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+    gunicorn settings for running the dashboard in production.
+
+    The app is preloaded in the master process before the workers are
+    forked, so the master dataframe, the report indexes and the category
+    cubes are built once and the workers share those pages copy-on-write.
+    Nothing writes to the numpy buffers after load, so they stay shared.
+    Python's garbage collector would otherwise touch every object header
+    and force copies, so everything loaded so far is frozen out of its
+    reach before forking.
+
+    Each worker runs its own data watcher thread, started after the fork,
+    so new data is picked up without restarting the server.  Data
+    reloaded in a worker is private to it rather than shared.  Each worker
+    also warms its own chart cache in the background once it starts.
+
+    With FED_FAST_START=1 nothing is loaded in the master.  Each worker
+    answers straight away and its watcher loads the data in the background,
+    so workers come up faster but each holds its own copy of the data.
+
+    Worker count and bind address can be set with FED_WORKERS and
+    FED_BIND.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("FED_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("FED_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("FED_THREADS", 4))
+preload_app = True
+timeout = 120
+
+
+# Runs in the master once the app is loaded and before any worker forks
+def when_ready(server):
+    gc.freeze()
+
+
+# Runs in each worker after it's forked - threads don't survive the fork
+def post_fork(server, worker):
+    import business_logic
+
+    business_logic.start_watcher()
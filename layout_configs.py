@@ -1,12 +1,15 @@
 """
 Layout Configs for setting up chart behavior
+
+The layouts are plain dicts - plotly checks them when a figure is built
+with one.  Building go.Layout objects here loaded the whole plotly
+validator and template machinery at import, which slowed startup.
 """
-import plotly.graph_objects as go
 
 ###########################################
 # Utilitiy Layouts
 ###########################################
-layout = go.Layout(
+layout = dict(
     template="plotly_dark",
     # plot_bgcolor="#FFFFFF",
     hovermode="x",
@@ -35,7 +38,7 @@ layout = go.Layout(
     ),
 )
 
-layout_simple = go.Layout(
+layout_simple = dict(
     template="plotly_dark",
     # plot_bgcolor="#FFFFFF",
     hovermode="x",
@@ -67,7 +70,7 @@ layout_simple = go.Layout(
     ),
 )
 
-layout_bars = go.Layout(
+layout_bars = dict(
     template="plotly_dark",
     # plot_bgcolor="#FFFFFF",
     xaxis=dict(title=""),
@@ -76,7 +79,7 @@ layout_bars = go.Layout(
     ),
 )
 
-layout_vertical = go.Layout(
+layout_vertical = dict(
     template="plotly_dark",
     # plot_bgcolor="#FFFFFF",
     hovermode="y",
@@ -1,12 +1,23 @@
+import time
+
+# Start of startup, for the breakdown on /metrics - see startup_seconds
+startup_start = time.perf_counter()
+
+import flask
 import dash
 from dash import html
 from dash import dcc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 from datetime import date
 import business_logic as bl
 import layout_configs as lc
 import support_functions as sf
+import metrics as mx
+
+# Seconds from startup_start to the end of each startup phase
+startup_seconds = {"imports": time.perf_counter() - startup_start}
 
 #############################################################################
 # Style modifications
@@ -23,54 +34,107 @@ DROPDOWN_STYLE = {"textAlign": "left"}
 #############################################################################
 # Content
 #############################################################################
-# Create drop-down selector and initial date picker
-report_select = dbc.Row(
-    [
-        dbc.Col(
-            [
-                html.Div(
-                    [
-                        dcc.Dropdown(
-                            id="report",
-                            options=[
-                                {
-                                    "label": label,
-                                    "value": value,
-                                }
-                                for value, label in bl.fed_list_abbrev.items()
-                            ],
-                            # default report to populate
-                            value="CPIAUCSL",
-                        ),
-                    ],
-                    className="dash-bootstrap",
-                ),
-            ],
-            md=6,
-        ),
-        dbc.Col(
-            [
-                html.Div(
-                    [
-                        dcc.DatePickerSingle(
-                            id="start-date",
-                            min_date_allowed=date(2008, 1, 1),
-                            initial_visible_month=date(2020, 1, 1),
-                            date=date(2020, 1, 1),
-                        ),
-                    ],
-                    className="dash-bootstrap",
-                )
-            ],
-            md=2,
-        ),
+# Where the start date picker opens
+default_start_date = date.fromisoformat(bl.default_start_date)
+
+# Shown until the data has loaded (see fast_start in business_logic), and
+# how often (milliseconds) the page checks whether it has
+loading_message = dbc.Alert("Loading data...", color="secondary")
+loading_check_interval = 1000
+
+
+# Dropdown entries for every report in a data snapshot - none while loading
+def report_options(data):
+    if data is None:
+        return []
+    return [
+        {
+            "label": label,
+            "value": value,
+        }
+        for value, label in data.fed_list_abbrev.items()
     ]
-)
 
-# Info Bar
-info_bar = html.Div(
-    id="summary",
-)
+
+# Create drop-down selector, initial date picker and as-of date picker
+# The as-of date shows everything as it was known on that date - only
+# releases up to then are used.  Cleared, it shows the latest data.
+# The interval checks for reloaded data and the store holds the data version
+# the page is showing.  When it changes everything redraws.  Built for each
+# page view from the current snapshot.  While the data is loading there's
+# no version yet and the interval checks more often.
+def make_report_select(data):
+    version = data.version if data is not None else None
+    return dbc.Row(
+        [
+            dcc.Interval(id="data-check", interval=check_interval(version)),
+            dcc.Store(id="data-version", data=version),
+            dbc.Col(
+                [
+                    html.Div(
+                        [
+                            dcc.Dropdown(
+                                id="report",
+                                options=report_options(data),
+                                # default report to populate
+                                value=bl.default_report,
+                            ),
+                        ],
+                        className="dash-bootstrap",
+                    ),
+                ],
+                md=6,
+            ),
+            dbc.Col(
+                [
+                    html.Div(
+                        [
+                            dcc.DatePickerSingle(
+                                id="start-date",
+                                min_date_allowed=date(2008, 1, 1),
+                                initial_visible_month=default_start_date,
+                                date=default_start_date,
+                            ),
+                        ],
+                        className="dash-bootstrap",
+                    )
+                ],
+                md=2,
+            ),
+            dbc.Col(
+                [
+                    html.Div(
+                        [
+                            dcc.DatePickerSingle(
+                                id="as-of-date",
+                                min_date_allowed=date(2008, 1, 1),
+                                placeholder="As of: latest",
+                                clearable=True,
+                            ),
+                        ],
+                        className="dash-bootstrap",
+                    )
+                ],
+                md=2,
+            ),
+        ]
+    )
+
+
+# Milliseconds between checks for new data
+def check_interval(version):
+    if version is None:
+        return loading_check_interval
+    return bl.reload_interval * 1000
+
+
+# Info Bar - says the data is loading until there's a summary to show
+def make_info_bar(data):
+    return html.Div(
+        id="summary",
+        children=loading_message if data is None else None,
+    )
+
 
 # Container for raw data charts
 basic_data = dbc.Row(
@@ -87,8 +151,11 @@ basic_data = dbc.Row(
 )
 
 # Container for periodic charts
+# The store holds the selected report's series for drawing these charts in
+# the browser
 baseline_data = dbc.Row(
     [
+        dcc.Store(id="report-series"),
         dbc.Col(
             dcc.Graph(
                 id="change-from-baseline-chart",
@@ -133,34 +200,40 @@ category_data = dbc.Row(
 ####################################################
 # Layout Creation Section
 ####################################################
-main_page = html.Div(
-    [
-        html.Hr(),
-        html.H4("Federal Reserve Economic Data Analysis", style=TEXT_STYLE),
-        html.Hr(),
-        report_select,
-        html.Hr(),
-        info_bar,
-        html.Hr(),
-        basic_data,
-        html.Hr(),
-        baseline_data,
-        html.Hr(),
-        html.H5("Comparison of Data in Broad Category", style=TEXT_STYLE),
-        html.Hr(),
-        category_data,
-        html.Hr(),
-    ],
-    style=CONTENT_STYLE,
-)
+# Built for each page view so it reflects the current snapshot, or the
+# loading state if there isn't one yet
+def make_main_page(data):
+    return html.Div(
+        [
+            html.Hr(),
+            html.H4("Federal Reserve Economic Data Analysis", style=TEXT_STYLE),
+            html.Hr(),
+            make_report_select(data),
+            html.Hr(),
+            make_info_bar(data),
+            html.Hr(),
+            basic_data,
+            html.Hr(),
+            baseline_data,
+            html.Hr(),
+            html.H5("Comparison of Data in Broad Category", style=TEXT_STYLE),
+            html.Hr(),
+            category_data,
+            html.Hr(),
+        ],
+        style=CONTENT_STYLE,
+    )
+
 
 #############################################################################
 # Application parameters
 #############################################################################
+# compress gzips (or brotlis) responses, which shrinks figure json a lot
 app = dash.Dash(
     __name__,
     suppress_callback_exceptions=True,
     external_stylesheets=[dbc.themes.CYBORG],
+    compress=True,
 )
 app.config.suppress_callback_exceptions = True
 app.title = "Federal Reserve Data Analysis"
@@ -176,7 +249,255 @@ def display_page(pathname):
     # if pathname == "/market-sentiment":
     #     return volumes
     # else:
-    return main_page
+    return make_main_page(bl.get_dataset())
+
+
+####################################################
+#  Metrics
+####################################################
+# Prometheus style metrics on /metrics - see metrics.py.  Callback timings
+# are taken around the whole request, json encoding and compression
+# included.  The data stages and chart builders time themselves.
+callback_seconds = mx.Histogram(
+    "fed_callback_seconds",
+    "Time to answer each Dash callback request",
+    labels=["callback"],
+)
+callback_bytes = mx.Histogram(
+    "fed_callback_response_bytes",
+    "Size of each Dash callback response before and after compression",
+    labels=["callback", "encoding"],
+    buckets=mx.size_buckets,
+)
+callback_errors = mx.Counter(
+    "fed_callback_errors_total",
+    "Dash callback requests that failed",
+    labels=["callback"],
+)
+
+
+# The callback function behind an output, e.g. basic_report for
+# basic-chart.figure
+def callback_name(output):
+    callback = app.callback_map.get(output, {}).get("callback")
+    return getattr(callback, "__name__", output)
+
+
+# The output a successful callback response is for, or None for anything
+# else
+def payload_output(response):
+    if not flask.request.path.endswith("_dash-update-component"):
+        return None
+    if response.direct_passthrough or response.status_code != 200:
+        return None
+    body = flask.request.get_json(silent=True) or {}
+    return body.get("output")
+
+
+# Runs before compression - the raw json size
+@app.server.after_request
+def record_payload_size(response):
+    output = payload_output(response)
+    if output is not None:
+        callback_bytes.observe(len(response.get_data()), callback_name(output), "raw")
+    return response
+
+
+# Flask runs after_request functions last registered first, so putting this
+# at the front of the list runs it after compression - the size on the wire
+def record_sent_size(response):
+    output = payload_output(response)
+    if output is not None:
+        callback_bytes.observe(len(response.get_data()), callback_name(output), "sent")
+    return response
+
+
+app.server.after_request_funcs.setdefault(None, []).insert(0, record_sent_size)
+
+
+@app.server.before_request
+def start_callback_timer():
+    if flask.request.path.endswith("_dash-update-component"):
+        flask.g.callback_start = time.perf_counter()
+        # The background warm-up waits while callbacks are running
+        flask.g.callback_running = True
+        bl.request_started()
+
+
+@app.server.teardown_request
+def end_callback(error):
+    if flask.g.pop("callback_running", False):
+        bl.request_finished()
+
+
+def record_callback_time(response):
+    start = flask.g.pop("callback_start", None)
+    if start is not None:
+        body = flask.request.get_json(silent=True) or {}
+        name = callback_name(body.get("output"))
+        callback_seconds.observe(time.perf_counter() - start, name)
+        if response.status_code >= 500:
+            callback_errors.inc(name)
+    return response
+
+
+app.server.after_request_funcs[None].insert(0, record_callback_time)
+
+
+# Read a value off the current snapshot - nothing while it's loading
+def dataset_metric(func):
+    def read():
+        data = bl.get_dataset()
+        return None if data is None else func(data)
+
+    return read
+
+
+def dataset_rows(data):
+    return {("master",): data.rows, ("latest",): len(data.fed_latest)}
+
+
+def dataset_bytes(data):
+    return {(part,): size for part, size in data.memory_usage().items()}
+
+
+def cache_stats(stat):
+    return lambda: {
+        ("figure",): sf.figure_cache.stats()[stat],
+        ("prepared",): bl.prepared_cache.stats()[stat],
+    }
+
+
+mx.GaugeFunction(
+    "fed_data_load_seconds",
+    "Time the last data load took",
+    lambda: sf.fed_load_info.get("seconds"),
+)
+mx.GaugeFunction(
+    "fed_dataset_build_seconds",
+    "Time building the current dataset snapshot took",
+    dataset_metric(lambda data: data.build_seconds),
+)
+mx.GaugeFunction(
+    "fed_dataset_version",
+    "Version of the current dataset snapshot",
+    dataset_metric(lambda data: data.version),
+)
+mx.GaugeFunction(
+    "fed_dataset_rows",
+    "Rows in the current dataset",
+    dataset_metric(dataset_rows),
+    labels=["frame"],
+)
+mx.GaugeFunction(
+    "fed_dataset_reports",
+    "Reports in the current dataset",
+    dataset_metric(lambda data: len(data.latest_index)),
+)
+mx.GaugeFunction(
+    "fed_dataset_bytes",
+    "Memory held by each part of the current dataset",
+    dataset_metric(dataset_bytes),
+    labels=["part"],
+)
+mx.GaugeFunction(
+    "fed_warmup_charts",
+    "Charts in the current warm-up - planned, drawn and failed",
+    lambda: {
+        ("total",): bl.warmup_status["total"],
+        ("done",): bl.warmup_status["done"],
+        ("failed",): bl.warmup_status["failed"],
+    },
+    labels=["state"],
+)
+mx.GaugeFunction(
+    "fed_warmup_seconds",
+    "Time the current warm-up has taken so far",
+    lambda: bl.warmup_status["seconds"],
+)
+mx.GaugeFunction(
+    "fed_warmup_version",
+    "Dataset version the current warm-up is for",
+    lambda: bl.warmup_status["version"],
+)
+mx.GaugeFunction(
+    "fed_startup_seconds",
+    "Seconds from the start of startup to the end of each phase",
+    lambda: {(phase,): seconds for phase, seconds in startup_report().items()},
+    labels=["phase"],
+)
+mx.GaugeFunction(
+    "fed_cache_entries", "Entries in each cache", cache_stats("entries"), ["cache"]
+)
+mx.GaugeFunction(
+    "fed_cache_hits_total",
+    "Cache hits",
+    cache_stats("hits"),
+    ["cache"],
+    metric_type="counter",
+)
+mx.GaugeFunction(
+    "fed_cache_misses_total",
+    "Cache misses",
+    cache_stats("misses"),
+    ["cache"],
+    metric_type="counter",
+)
+mx.GaugeFunction(
+    "fed_cache_evictions_total",
+    "Entries pushed out of each cache to stay within its limits",
+    cache_stats("evictions"),
+    ["cache"],
+    metric_type="counter",
+)
+mx.GaugeFunction(
+    "fed_figure_cache_bytes",
+    "Size of the figures in the figure cache",
+    lambda: sf.figure_cache.stats()["bytes"],
+)
+
+
+@app.server.route("/metrics")
+def metrics():
+    return flask.Response(mx.render(), mimetype="text/plain; version=0.0.4")
+
+
+####################################################
+#  Startup and health checks
+####################################################
+# Startup is broken down into phases, each timed from the top of this file
+# (so the interpreter starting up isn't counted):
+#   imports - the imports at the top of this file
+#   app - the layout and callbacks set up
+#   first_response - the first response of any kind sent
+#   data_ready - the first data snapshot ready.  With fast start this can
+#       come after the first response.
+def startup_report():
+    report = dict(startup_seconds)
+    if bl.dataset_ready_at is not None:
+        report["data_ready"] = bl.dataset_ready_at - startup_start
+    return report
+
+
+@app.server.after_request
+def record_first_response(response):
+    if "first_response" not in startup_seconds:
+        startup_seconds["first_response"] = time.perf_counter() - startup_start
+    return response
+
+
+# Liveness - answers as soon as the server is up
+@app.server.route("/health")
+def health():
+    return "ok"
+
+
+# Readiness - 503 until the data has loaded
+@app.server.route("/ready")
+def ready():
+    if bl.get_dataset() is None:
+        return flask.Response("loading", status=503)
+    return "ok"
 
 
 ####################################################
@@ -184,86 +505,131 @@ def display_page(pathname):
 ####################################################
 
 
+####################################################
+#  Callbacks - data reloads
+####################################################
+# The data is reloaded in the background when the file changes (see
+# business_logic).  Pages pick up the new version on their next check.
+@app.callback(
+    Output("data-version", "data"),
+    Input("data-check", "n_intervals"),
+    State("data-version", "data"),
+)
+def check_data_version(n_intervals, version):
+    data = bl.get_dataset()
+    if data is None or data.version == version:
+        raise PreventUpdate
+    return data.version
+
+
+@app.callback(Output("report", "options"), Input("data-version", "data"))
+def report_dropdown(version):
+    return report_options(bl.get_dataset())
+
+
+# Back to the normal check interval once the data has loaded
+app.clientside_callback(
+    "function(version) { return version === null ? %d : %d; }"
+    % (check_interval(None), bl.reload_interval * 1000),
+    Output("data-check", "interval"),
+    Input("data-version", "data"),
+)
+
+
+# The current snapshot for a callback.  Until the data has loaded there's
+# nothing to draw, so the callback leaves its output alone.
+def loaded_dataset():
+    data = bl.get_dataset()
+    if data is None:
+        raise PreventUpdate
+    return data
+
+
 ####################################################
 #  Callbacks - charts
 ####################################################
+# The basic chart also listens to its own relayoutData so zooming can
+# fetch more detail.  Returns the zoomed (start, end) window, or None for
+# the full chart - a new report or date always gets the full chart.
+# Relayouts that don't touch the x range (drawing shapes, resizing) don't
+# update the chart at all.
+def get_zoom_window(graph_id, relayout_data):
+    triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+    if triggered != [graph_id + ".relayoutData"]:
+        return None
+
+    window = sf.relayout_window(relayout_data)
+    if window is None:
+        raise PreventUpdate
+    if window == "reset":
+        return None
+    return window
+
+
 # Basic Chart with raw report data
 @app.callback(
     dash.dependencies.Output("basic-chart", "figure"),
     [
         dash.dependencies.Input("report", "value"),
         dash.dependencies.Input("start-date", "date"),
+        dash.dependencies.Input("basic-chart", "relayoutData"),
+        dash.dependencies.Input("as-of-date", "date"),
+        dash.dependencies.Input("data-version", "data"),
     ],
 )
-def basic_report(report, init_date):
+def basic_report(report, init_date, relayout_data, as_of, version):
     # set the date from the picker
     if init_date is not None:
         date_object = date.fromisoformat(init_date)
         date_string = date_object.strftime("%Y-%m-%d")
 
-    # Filter to the report level
-    df = sf.get_report_from_fed_data(bl.fed_df, report)
-    df1 = sf.get_report_after_date_fed_data(df, date_string)
-    # Filter again to the release
-    df2 = sf.get_release_after_date_fed_data(df1, date_string)
+    # Zooming refetches just the visible window at full detail
+    window = get_zoom_window("basic-chart", relayout_data)
 
-    # Assign long names
-    df2 = sf.add_report_long_names(df2)
-    long_name = df2.report_long_name.iloc[0]
-
-    fig = sf.basic_chart(df2, long_name)
+    # Filtered data is shared with the other chart callbacks and the figure
+    # comes from the cache when we've drawn it before
+    fig = bl.get_chart("basic", report, date_string, window, loaded_dataset(), as_of)
     return fig
 
 
-# Baseline Chart - sets change relative to the baseline date
+# Change Charts
+# The change from baseline and change from prior period charts are drawn in
+# the browser (assets/02_change_charts.js).  The server only sends the
+# report's latest vintage series (as of the as-of date) when the report
+# changes - start date changes and zooming never come back to the server.
 @app.callback(
-    dash.dependencies.Output("change-from-baseline-chart", "figure"),
+    dash.dependencies.Output("report-series", "data"),
     [
         dash.dependencies.Input("report", "value"),
-        dash.dependencies.Input("start-date", "date"),
+        dash.dependencies.Input("as-of-date", "date"),
+        dash.dependencies.Input("data-version", "data"),
     ],
 )
-def change_from_baseline_report(report, init_date):
-    if init_date is not None:
-        date_object = date.fromisoformat(init_date)
-        date_string = date_object.strftime("%Y-%m-%d")
+def report_series(report, as_of, version):
+    return bl.get_report_series(report, loaded_dataset(), as_of)
 
-    df = sf.get_report_from_fed_data(bl.fed_df, report)
-    # Hook function for slider or other date range finder
-    df1 = sf.get_report_after_date_fed_data(df, date_string)
-    df2 = sf.get_latest_data(df1)
-    df2 = sf.period_change(df2)
-    df2 = sf.add_report_long_names(df2)
-    long_name = df2.report_long_name.iloc[0]
-    fig = sf.baseline_change_chart(df2, long_name)
-
-    return fig
 
+# Baseline Chart - sets change relative to the baseline date
+app.clientside_callback(
+    ClientsideFunction(namespace="fed", function_name="baseline_chart"),
+    dash.dependencies.Output("change-from-baseline-chart", "figure"),
+    [
+        dash.dependencies.Input("report-series", "data"),
+        dash.dependencies.Input("start-date", "date"),
+        dash.dependencies.Input("change-from-baseline-chart", "relayoutData"),
+    ],
+)
 
 # Period Chart - sets change relative to the previous period
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="fed", function_name="period_chart"),
     dash.dependencies.Output("change-from-period-chart", "figure"),
     [
-        dash.dependencies.Input("report", "value"),
+        dash.dependencies.Input("report-series", "data"),
         dash.dependencies.Input("start-date", "date"),
+        dash.dependencies.Input("change-from-period-chart", "relayoutData"),
     ],
 )
-def change_from_period_report(report, init_date):
-    if init_date is not None:
-        date_object = date.fromisoformat(init_date)
-        date_string = date_object.strftime("%Y-%m-%d")
-
-    # This is effecitvely the baseline function just updated to call the other
-    # chart for period
-    df = sf.get_report_from_fed_data(bl.fed_df, report)
-    df1 = sf.get_report_after_date_fed_data(df, date_string)
-    df2 = sf.get_latest_data(df1)
-    df2 = sf.period_change(df2)
-    df2 = sf.add_report_long_names(df2)
-    long_name = df2.report_long_name.iloc[0]
-
-    fig = sf.periodic_change_chart(df2, long_name)
-    return fig
 
 
 # Category Data Comparison to survery larger economic landscape
@@ -273,18 +639,20 @@ def change_from_period_report(report, init_date):
     [
         dash.dependencies.Input("report", "value"),
         dash.dependencies.Input("start-date", "date"),
+        dash.dependencies.Input("as-of-date", "date"),
+        dash.dependencies.Input("data-version", "data"),
     ],
 )
-def category_period_report(report, init_date):
+def category_period_report(report, init_date, as_of, version):
     if init_date is not None:
         date_object = date.fromisoformat(init_date)
         date_string = date_object.strftime("%Y-%m-%d")
 
-    # we need a few things since logic is handled in the helper function
-    # The master dataframe
-    # The selected report
-    # The starting date
-    fig = sf.category_chart_perodic(bl.fed_df, report, date_string)
+    # The category data is built from the master dataframe, the selected
+    # report and the starting date.  It's shared with the baseline chart.
+    fig = bl.get_chart(
+        "category_period", report, date_string, data=loaded_dataset(), as_of=as_of
+    )
 
     return fig
 
@@ -295,14 +663,18 @@ def category_period_report(report, init_date):
     [
         dash.dependencies.Input("report", "value"),
         dash.dependencies.Input("start-date", "date"),
+        dash.dependencies.Input("as-of-date", "date"),
+        dash.dependencies.Input("data-version", "data"),
     ],
 )
-def category_baseline_report(report, init_date):
+def category_baseline_report(report, init_date, as_of, version):
     if init_date is not None:
         date_object = date.fromisoformat(init_date)
         date_string = date_object.strftime("%Y-%m-%d")
 
-    fig = sf.category_chart_baseline(bl.fed_df, report, date_string)
+    fig = bl.get_chart(
+        "category_baseline", report, date_string, data=loaded_dataset(), as_of=as_of
+    )
 
     return fig
 
@@ -312,11 +684,16 @@ def category_baseline_report(report, init_date):
 ###################################################
 @app.callback(
     dash.dependencies.Output("summary", "children"),
-    [dash.dependencies.Input("report", "value")],
+    [
+        dash.dependencies.Input("report", "value"),
+        dash.dependencies.Input("as-of-date", "date"),
+        dash.dependencies.Input("data-version", "data"),
+    ],
 )
-def dashboard_summary_numbers(report):
+def dashboard_summary_numbers(report, as_of, version):
     # Grab some values from the most recent DA datafame
-    df1 = sf.get_report_from_fed_data(bl.fed_df, report)
+    data = loaded_dataset()
+    df1 = bl.get_report_releases(data, report, as_of=as_of)
 
     # I only care about the most recent row so pull it
     #  It makes reference easier further down.
@@ -364,7 +741,11 @@ def dashboard_summary_numbers(report):
 ###################################################
 # Server Run
 ###################################################
+startup_seconds["app"] = time.perf_counter() - startup_start
+
 if __name__ == "__main__":
+    # Pick up new data without restarting
+    bl.start_watcher()
     # This line works for linux / OSX. Change debug to True to turn on debugging
     app.run_server(debug=False, host="0.0.0.0", port=8050, dev_tools_hot_reload=True)
     # Windows seems to dislike running with the host set to 0.0.0.0
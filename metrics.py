@@ -0,0 +1,221 @@
+"""
+    Lightweight Prometheus style metrics for the dashboard.
+
+    Histograms are fixed arrays of bucket counts - recording a value is a
+    bisect and an increment under a lock, a microsecond or two.  Nothing is
+    formatted until /metrics is scraped, and gauges (row counts, cache
+    stats and so on) are only read at scrape time, so there's next to no
+    cost when nobody is looking.
+
+    Exposed in the Prometheus text format, so any Prometheus compatible
+    scraper can read it without extra libraries.
+
+"""
+import bisect
+import functools
+import threading
+import time
+
+# Set to False to stop recording.  Decorated functions then just call
+# through.
+metrics_enabled = True
+
+# Bucket upper bounds for timings (seconds) and payload sizes (bytes)
+latency_buckets = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+size_buckets = (1e3, 3e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+# Everything that gets rendered, in registration order
+registry = []
+
+
+#############################################################################
+# Metric types
+#############################################################################
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=latency_buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count, sum]
+        self.series = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, *label_values):
+        if not metrics_enabled:
+            return
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [
+            "# HELP %s %s" % (self.name, self.help_text),
+            "# TYPE %s histogram" % self.name,
+        ]
+        with self.lock:
+            series = {key: list(counts) for key, counts in self.series.items()}
+        for label_values, counts in sorted(series.items()):
+            labels = label_pairs(self.labels, label_values)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts[:-1]):
+                total += count
+                bucket_labels = labels + [("le", format_value(bound))]
+                lines.append(
+                    "%s_bucket%s %d" % (self.name, format_labels(bucket_labels), total)
+                )
+            lines.append(
+                "%s_sum%s %s"
+                % (self.name, format_labels(labels), format_value(counts[-1]))
+            )
+            lines.append("%s_count%s %d" % (self.name, format_labels(labels), total))
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        if not metrics_enabled:
+            return
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [
+            "# HELP %s %s" % (self.name, self.help_text),
+            "# TYPE %s counter" % self.name,
+        ]
+        with self.lock:
+            values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            labels = format_labels(label_pairs(self.labels, label_values))
+            lines.append("%s%s %s" % (self.name, labels, format_value(value)))
+        return lines
+
+
+# A value read from func at scrape time.  func returns a number, or a dict
+# of label value tuples to numbers.  Running totals kept elsewhere (cache
+# hits and so on) can be exposed as counters with metric_type="counter".
+class GaugeFunction:
+    def __init__(self, name, help_text, func, labels=(), metric_type="gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.labels = tuple(labels)
+        self.metric_type = metric_type
+        registry.append(self)
+
+    def render(self):
+        lines = [
+            "# HELP %s %s" % (self.name, self.help_text),
+            "# TYPE %s %s" % (self.name, self.metric_type),
+        ]
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in sorted(values.items()):
+            if value is None:
+                continue
+            labels = format_labels(label_pairs(self.labels, label_values))
+            lines.append("%s%s %s" % (self.name, labels, format_value(value)))
+        return lines
+
+
+#############################################################################
+# Formatting
+#############################################################################
+def label_pairs(names, values):
+    return list(zip(names, values))
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, escape(value)) for name, value in pairs)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+# Everything in the registry in the Prometheus text format
+def render():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+#############################################################################
+# Timing helpers
+#############################################################################
+stage_seconds = Histogram(
+    "fed_stage_seconds",
+    "Time spent in each data processing stage",
+    labels=["stage"],
+)
+chart_seconds = Histogram(
+    "fed_chart_build_seconds",
+    "Time spent building each chart figure",
+    labels=["chart"],
+)
+
+
+# Decorator recording every call of a function in a histogram, labelled with
+# the function's name
+def timed(histogram):
+    def decorate(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics_enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, name)
+
+        return wrapper
+
+    return decorate
+
+
+timed_stage = timed(stage_seconds)
+timed_chart = timed(chart_seconds)
@@ -0,0 +1,95 @@
+"""
+    Registry of every report the dashboard knows about.
+
+    Each entry is (report_name, report_long_name, category).  The data
+    downloader uses this to decide what to pull from FRED and the dashboard
+    uses it to label reports and group them into categories.
+
+    To track a new series, add a line here and rerun the downloader.
+"""
+
+report_registry = [
+    ("WM1NS", "M1 Money Supply", "Economy - Weekly"),
+    ("WM2NS", "M2 Money Supply", "Economy - Weekly"),
+    ("ICSA", "Initial Unemployment", "Employment - Weekly"),
+    ("CCSA", "Continued Unemployment", "Employment - Weekly"),
+    ("JTSJOL", "Job Openings: Total Nonfarm", "Employment"),
+    ("JTSQUL", "Job Quits: Total Nonfarm", "Employment"),
+    ("PAYEMS", "Non-Farm Employment", "Employment"),
+    ("NPPTTL", "Total Nonfarm Private Payroll Employment (ADP)", "Employment"),
+    ("RSXFS", "Retail Sales", "Economy"),
+    ("TCU", "Capacity Utilization", "Production"),
+    ("UMCSENT", "Consumer Sentiment Index", "Economy"),
+    ("BUSINV", "Business Inventories", "Production"),
+    ("INDPRO", "Industrial Production Index", "Production"),
+    ("IPG331S", "Primary Metal Production", "Production"),
+    ("IPG332S", "Fabricated Metal Products Production", "Production"),
+    ("IPG334S", "Computer and Electronic Products Production", "Production"),
+    (
+        "IPG335S",
+        "Electrical Equipment, Appliance, and Component Production",
+        "Production",
+    ),
+    ("IPG3361T3S", "Motor Vehicles and Parts Production", "Production"),
+    (
+        "IPMINE",
+        "Mining, Quarrying, and Oil and Gas Extraction Production",
+        "Production",
+    ),
+    ("GACDFSA066MSFRBPHI", "Philidelphia Fed Manufacturing Index", "Manufacturing"),
+    ("GACDISA066MSFRBNY", "Empire State Manufacturing Index", "Manufacturing"),
+    ("IR", "Import Price Index", "Economy"),
+    ("IQ", "Export Price Index", "Economy"),
+    ("PPIACO", "Producer Price Index (All)", "Inflation"),
+    ("PCUOMINOMIN", "Producer Price Index Mining", "Inflation"),
+    ("CPIAUCSL", "Consumer Price Index (All)", "Inflation"),
+    ("CPILFESL", "Consumer Price Index (Core)", "Inflation"),
+    ("MICH", "U of M: Inflation Expectation", "Inflation"),
+    ("AMDMUO", "Manufacturers Unfilled Orders: Durable Goods", "Production"),
+    ("AMTMUO", "Manufacturers Unfilled Orders: Total Manufacturing", "Production"),
+    (
+        "ANXAUO",
+        "Manufacturers Unfilled Orders: Nondefense Capital Goods Excluding Aircraft",
+        "Production",
+    ),
+    ("AMVPUO", "Manufacturers Unfilled Orders: Motor Vehicles and Parts", "Production"),
+    ("BACTSAMFRBDAL", "Texas Fed Manufacturing Index", "Manufacturing"),
+    (
+        "IPB53122S",
+        "Industrial Production: Durable Goods Materials: Semiconductors, Printed Circuit Boards, and Other",
+        "Production",
+    ),
+    (
+        "IPG3254N",
+        "Industrial Production: Manufacturing: Non-Durable Goods: Pharmaceutical and Medicine",
+        "Production",
+    ),
+    ("IPDMAN", "Industrial Production: Durable Manufacturing", "Production"),
+    ("IPFINAL", "Industrial Production: Final Products", "Production"),
+    ("CSCICP03USM665S", "Consumer Opinion Surveys: Confidence Indicators", "Economy"),
+    ("MNFCTRIRSA", "Manufacturers: Inventories to Sales Ratio", "Production"),
+    ("DGORDER", "Manufacturer New Orders: Durable Goods", "Production"),
+    (
+        "NEWORDER",
+        "Manufacturer New Orders: Nondefense Capital Goods Excluding Aircraft",
+        "Production",
+    ),
+]
+
+# Just the FRED series ids, in registry order
+report_list = [report_name for report_name, _, _ in report_registry]
+
+# Lookups used to label dataframes
+report_long_names = {
+    report_name: long_name for report_name, long_name, _ in report_registry
+}
+report_categories = {
+    report_name: category for report_name, _, category in report_registry
+}
+
+
+#############################################################################
+# Backstop
+#############################################################################
+if __name__ == "__main__":
+    print("Report registry has nothing to run directly")
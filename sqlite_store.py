@@ -0,0 +1,239 @@
+"""
+    Local SQLite store for the report data.
+
+    This holds the same rows as the CSV dump in a table keyed on
+    (report_name, report_date, release_date).  The downloader in data_miner
+    upserts into it, so a re-pull only writes the rows that changed.
+
+    The report / date / release filters are answered from that index in SQL,
+    so only the matching slice is ever loaded into pandas.  With
+    data_backend = "sqlite" in support_functions the dashboard keeps just
+    the latest vintages in memory and queries each report's release history
+    from here when a chart needs it.
+
+    To build the store from an existing CSV dump:
+
+        python sqlite_store.py ./data/fed_dump.csv ./data/fed_dump.sqlite
+
+"""
+import os
+import pathlib
+import sqlite3
+import sys
+from contextlib import closing
+import pandas as pd
+
+# Columns in the table - the same layout as the CSV dump.  Dates are stored
+# as ISO text so they sort and compare correctly.
+store_columns = ["release_date", "report_date", "data", "report_name", "hash"]
+
+schema = """
+CREATE TABLE IF NOT EXISTS fed_data (
+    report_name TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    release_date TEXT NOT NULL,
+    data REAL,
+    hash INTEGER,
+    PRIMARY KEY (report_name, report_date, release_date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS store_info (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO store_info (key, value) VALUES ('version', 0);
+"""
+
+# Rows whose hash hasn't changed are left alone so re-pulling the same
+# vintages doesn't rewrite anything
+upsert_sql = """
+INSERT INTO fed_data (release_date, report_date, data, report_name, hash)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (report_name, report_date, release_date) DO UPDATE SET
+    data = excluded.data,
+    hash = excluded.hash
+WHERE fed_data.hash IS NOT excluded.hash
+"""
+
+
+#############################################################################
+# Connection
+#############################################################################
+# Open the store for writing, creating it and its tables if needed.  WAL
+# lets the dashboard keep reading while the downloader writes.  Connections
+# are cheap so each call opens its own - sqlite connections can't be shared
+# between threads.
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(schema)
+    return conn
+
+
+# Open the store read-only.  Readers never take the write lock, and a
+# missing store is an error rather than a new empty database.
+def connect_readonly(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError("No SQLite store at %s" % path)
+    uri = pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=30)
+
+
+# Bumped on every write that changes rows, so readers can tell the store
+# has changed without looking at the file (WAL writes don't always touch
+# its modified time)
+def store_version(path):
+    with closing(connect_readonly(path)) as conn:
+        row = conn.execute(
+            "SELECT value FROM store_info WHERE key = 'version'"
+        ).fetchone()
+    return row[0]
+
+
+def count_rows(path):
+    with closing(connect_readonly(path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM fed_data").fetchone()[0]
+
+
+#############################################################################
+# Writing
+#############################################################################
+# Insert new rows and update changed ones.  df has the CSV dump layout.
+# Returns the number of rows inserted or updated.
+def upsert_rows(path, df):
+    rows = df[store_columns].copy()
+    for col in ["release_date", "report_date"]:
+        rows[col] = iso_dates(rows[col])
+    rows["data"] = rows["data"].astype(object).where(rows["data"].notna(), None)
+
+    with closing(connect(path)) as conn:
+        with conn:
+            before = conn.total_changes
+            conn.executemany(upsert_sql, rows.itertuples(index=False, name=None))
+            changed = conn.total_changes - before
+            if changed:
+                conn.execute(
+                    "UPDATE store_info SET value = value + 1 WHERE key = 'version'"
+                )
+    return changed
+
+
+#############################################################################
+# Reading
+#############################################################################
+# Rows matching the given filters, straight from the index.  Any filter left
+# as None isn't applied.  Dates can be strings, dates or timestamps.
+# Returns a frame in the CSV dump layout sorted by report, report_date and
+# release_date.
+def query_fed_data(path, **filters):
+    where, params = where_clause(**filters)
+    sql = "SELECT %s FROM fed_data%s" % (", ".join(store_columns), where)
+    sql += " ORDER BY report_name, report_date, release_date"
+
+    with closing(connect_readonly(path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+# The last vintage of every report_date released by until_release_date (or
+# at all), for the reports matching the filters.  SQLite fills the bare
+# columns of a MAX() group from the row holding the max, and the primary
+# key already has the rows in (report, report_date, release_date) order, so
+# this is a walk of the index rather than a sort.
+def query_latest_data(path, **filters):
+    where, params = where_clause(**filters)
+    columns = [
+        "MAX(release_date) AS release_date" if column == "release_date" else column
+        for column in store_columns
+    ]
+    sql = "SELECT %s FROM fed_data%s" % (", ".join(columns), where)
+    sql += " GROUP BY report_name, report_date ORDER BY report_name, report_date"
+
+    with closing(connect_readonly(path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+# Row count, last release and a content fingerprint for each report - enough
+# to list the reports and tell which changed without loading any rows.
+# TOTAL() sums as floats so the big row hashes can't overflow.
+def report_summary(path):
+    sql = """
+        SELECT report_name, COUNT(*) AS rows, MAX(release_date) AS last_release,
+               TOTAL(hash) AS hash_total, TOTAL(data) AS data_total
+        FROM fed_data GROUP BY report_name ORDER BY report_name
+    """
+    with closing(connect_readonly(path)) as conn:
+        return pd.read_sql_query(sql, conn)
+
+
+# WHERE clause and parameters for the filters the query functions take
+def where_clause(
+    report_name=None,
+    report_date=None,
+    after_report_date=None,
+    release_date=None,
+    after_release_date=None,
+    until_release_date=None,
+):
+    clauses = []
+    params = []
+    for column, op, value in [
+        ("report_name", "=", report_name),
+        ("report_date", "=", report_date),
+        ("report_date", ">=", after_report_date),
+        ("release_date", "=", release_date),
+        ("release_date", ">=", after_release_date),
+        ("release_date", "<=", until_release_date),
+    ]:
+        if value is None:
+            continue
+        if column != "report_name":
+            value = pd.Timestamp(value).strftime("%Y-%m-%d")
+        clauses.append("%s %s ?" % (column, op))
+        params.append(value)
+
+    if not clauses:
+        return "", params
+    return " WHERE " + " AND ".join(clauses), params
+
+
+# A handle on a store.  Passing one of these to the get_*_from_fed_data
+# helpers in support_functions runs the filter here instead of in pandas,
+# and with data_backend = "sqlite" the dashboard queries each report's
+# rows through one rather than holding the whole table.
+class FedStore:
+    def __init__(self, path):
+        self.path = path
+
+    def query(self, **filters):
+        return query_fed_data(self.path, **filters)
+
+    def latest(self, **filters):
+        return query_latest_data(self.path, **filters)
+
+    def summary(self):
+        return report_summary(self.path)
+
+    def version(self):
+        return store_version(self.path)
+
+
+# Dates as ISO text whatever they came in as
+def iso_dates(values):
+    return pd.to_datetime(values).dt.strftime("%Y-%m-%d")
+
+
+#############################################################################
+# Import
+#############################################################################
+# Load a CSV dump into the store
+def import_csv(csv_path, path):
+    df = pd.read_csv(csv_path, dtype={"release_date": str, "report_date": str})
+    return upsert_rows(path, df)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python sqlite_store.py <csv dump> <sqlite store>")
+        sys.exit(1)
+    print("%d rows imported" % import_csv(sys.argv[1], sys.argv[2]))
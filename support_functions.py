@@ -6,16 +6,34 @@
 
     This file is called by both the main app as well as the business logic
 
-    Note: It's called silently by plotly express, but the statsmodels
-    package is also a requirement.  This is because we are using linear
-    regression lines in the basic_chart function.
+    Note: The trendline on the basic_chart is computed here with numpy.
+    The statsmodels package is only needed if the trendline method is set
+    to "lowess" for an exact statsmodels fit - it's imported on first use.
+    plotly.express and pyarrow are also imported on first use, which keeps
+    them out of the startup time.
+
+    The data stages and chart builders are wrapped with the timers in
+    metrics.py so their timings show up on /metrics.
 
 """
+import os
+import tempfile
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 import layout_configs as lc
+import report_registry as rr
+import sqlite_store as ss
+import metrics as mx
 import plotly.graph_objects as go
-import plotly.express as px
+
+# pyarrow is optional - without it we just read the CSV directly.  Set by
+# load_pyarrow on the first load.
+pa = None
+feather = None
 
 #############################################################################
 # Configuration - Change these to suit
@@ -26,6 +44,67 @@ import plotly.express as px
 # data file exists.
 base_path = "./data/"
 
+# Raw CSV dump and the binary store built from it.  The store is rebuilt
+# automatically any time the CSV changes.
+csv_file = "fed_dump.csv"
+store_file = "fed_dump.feather"
+
+# Where the dashboard reads the data from:
+#   "csv" - the CSV dump (through the Feather store when pyarrow is there)
+#   "sqlite" - the indexed SQLite store the downloader upserts into.  Only
+#              the latest vintages are held in memory and each report's
+#              releases are queried as needed.
+data_backend = "csv"
+sqlite_file = "fed_dump.sqlite"
+
+# Compact in-memory layout for the master dataframe - see
+# compact_fed_data.  Report names become categoricals and the unused hash
+# column is dropped, which takes most of the memory on big dumps.
+# compact_float32 also stores the values as float32, halving them again at
+# the cost of precision (about 7 significant digits).
+compact_data = False
+compact_float32 = False
+
+# Threads build_category_cubes spreads the categories across.  The cubes
+# are built for every load and for each new as-of date a visitor picks.  1
+# builds them all with one pivot on the calling thread, which is best on a
+# single core - the per-category pivots only overlap where pandas drops
+# the GIL.
+category_workers = 1
+
+# Details from the most recent load - source, rows and seconds taken
+fed_load_info = {}
+
+# Figure cache limits.  Whichever is hit first triggers eviction of the
+# least recently used figures.
+figure_cache_entries = 256
+figure_cache_bytes = 64 * 1024 * 1024
+
+# Trendline for the raw data chart
+# method is one of:
+#   "binned_lowess" - tricube weighted local linear fit on a binned grid
+#   "kernel" - gaussian kernel smoother on a binned grid
+#   "lowess" - exact statsmodels lowess (slow, needs statsmodels)
+#   "none" - no trendline
+# bandwidth is the fraction of the date range each local fit looks at.
+# points is the size of the grid the binned methods work on.
+trendline_method = "binned_lowess"
+trendline_bandwidth = 2 / 3
+trendline_points = 200
+
+# Most points a time series chart sends to the browser.  Longer series are
+# downsampled with LTTB and zooming in fetches the window at full detail
+# (up to the same budget).  Charts with more points than the webgl
+# threshold are drawn with WebGL traces.
+chart_point_budget = 2000
+webgl_point_threshold = 1000
+
+# Figure payload settings.  Computed values are rounded to payload_decimals
+# before they go in a figure and the release date colorbar shows at most
+# colorbar_ticks labels.
+payload_decimals = 6
+colorbar_ticks = 8
+
 
 #############################################################################
 # Data Retreival and Handling
@@ -46,12 +125,120 @@ base_path = "./data/"
 
     Functions are defined that they can be easily adapted to pulling the data
     from a different source type if desired.
+
+    With compact_data set the loaded frame is shrunk by compact_fed_data
+    before anything else sees it.  memory_report shows where the bytes go.
+
+    Parsing the CSV gets slow as the history grows, so the first load writes
+    a columnar Feather copy next to it.  Later loads memory-map that file
+    directly with no parsing.
+
+    The data can also live in a local SQLite store (see sqlite_store.py).
+    The filtering helpers below accept either a dataframe or a store handle
+    from get_fed_source - with a store the filter runs in SQL against its
+    index and only the matching rows are loaded.
 """
-# Base retrieval function - reads from CSV
+# Identifies the current version of the data so changes can be spotted
+def get_fed_data_stamp():
+    if data_backend == "sqlite":
+        return ("sqlite", ss.store_version(base_path + sqlite_file))
+    csv_stat = os.stat(base_path + csv_file)
+    return (csv_stat.st_mtime_ns, csv_stat.st_size)
+
+
+# Something the filtering helpers can query - a store handle for the SQLite
+# backend or the full master dataframe otherwise
+def get_fed_source():
+    if data_backend == "sqlite":
+        return ss.FedStore(base_path + sqlite_file)
+    return get_fed_data()
+
+
+# Base retrieval function - reads from the binary store, which is rebuilt
+# from the CSV whenever the CSV changes.  If pyarrow isn't installed we
+# fall back to parsing the CSV every time like we used to.
+@mx.timed_stage
 def get_fed_data():
-    # file_path = base_path + "fed_data.csv"
-    file_path = base_path + "fed_dump.csv"
-    df = pd.read_csv(file_path, na_values="x")
+    if data_backend == "sqlite":
+        return read_fed_sqlite(base_path + sqlite_file)
+
+    start = time.perf_counter()
+    csv_path = base_path + csv_file
+    store_path = base_path + store_file
+    csv_stat = os.stat(csv_path)
+
+    source = "store"
+    df = None
+    use_store = load_pyarrow()
+    if use_store:
+        df = read_fed_store(store_path, csv_stat)
+    if df is None:
+        source = "csv"
+        df = read_fed_csv(csv_path)
+        if use_store:
+            write_fed_store(df, store_path, csv_stat)
+
+    df = compact_fed_data(df)
+    record_load(source, df, start)
+    return df
+
+
+# Import pyarrow the first time it's needed.  Returns whether it's there.
+def load_pyarrow():
+    global pa, feather
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.feather
+        except ImportError:
+            pa = False
+        else:
+            pa = pyarrow
+            feather = pyarrow.feather
+    return pa is not False
+
+
+def record_load(source, df, start):
+    fed_load_info["source"] = source
+    fed_load_info["rows"] = len(df)
+    fed_load_info["seconds"] = time.perf_counter() - start
+    print(
+        "Loaded %d rows from %s in %.3fs"
+        % (fed_load_info["rows"], source, fed_load_info["seconds"])
+    )
+
+
+# Every row in the SQLite store as the master dataframe
+def read_fed_sqlite(file_path):
+    start = time.perf_counter()
+    df = compact_fed_data(format_fed_data(ss.query_fed_data(file_path)))
+    record_load("sqlite", df, start)
+    return df
+
+
+# With the SQLite backend only the latest vintages are loaded up front
+def read_fed_latest(store):
+    start = time.perf_counter()
+    df = get_latest_from_store(store)
+    record_load("sqlite latest", df, start)
+    return df
+
+
+# Just the latest vintage of each report_date from a store, as known as of
+# a date (or now) - see build_latest_data
+@mx.timed_stage
+def get_latest_from_store(store, **filters):
+    return compact_fed_data(format_fed_data(store.latest(**filters)))
+
+
+# Parse the raw CSV dump into the master dataframe layout
+def read_fed_csv(file_path):
+    return format_fed_data(pd.read_csv(file_path, na_values="x"))
+
+
+# Rename and type the columns of a raw dump (CSV or SQLite) to the master
+# dataframe layout
+def format_fed_data(df):
     df.rename(
         {"data": "report_data", "hash": "report_hash"},
         axis=1,
@@ -63,167 +250,145 @@ def get_fed_data():
     return df
 
 
+# Write the master dataframe out as a typed, columnar Feather file.
+# Dates go in as date32, values as float64 and report_name as a dictionary
+# column.  The CSV mtime and size are stamped into the schema metadata so we
+# can tell when the store is stale.
+def write_fed_store(df, store_path, csv_stat):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.set_column(
+        table.schema.get_field_index("report_name"),
+        "report_name",
+        table.column("report_name").dictionary_encode(),
+    )
+    for col in ["report_date", "release_date"]:
+        table = table.set_column(
+            table.schema.get_field_index(col),
+            col,
+            table.column(col).cast(pa.date32()),
+        )
+    table = table.replace_schema_metadata(store_stamp(csv_stat))
+
+    # Write to a temp file and swap it in so a reader never sees half a file.
+    # The temp file is unique so workers loading at the same time don't trip
+    # over each other.  The store is only a cache - if it can't be written
+    # (a read-only data directory, say) the load carries on without it.
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(store_path) or ".",
+            prefix=os.path.basename(store_path) + ".",
+            suffix=".tmp",
+        )
+        os.close(fd)
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, store_path)
+    except OSError as error:
+        print("Couldn't write the data store: " + repr(error))
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Read the Feather store if it exists and matches the CSV it was built from.
+# Returns None if the store needs rebuilding.
+def read_fed_store(store_path, csv_stat):
+    if not os.path.exists(store_path):
+        return None
+    try:
+        table = feather.read_table(store_path, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if table.schema.metadata is None:
+        return None
+    stamp = store_stamp(csv_stat)
+    for key, value in stamp.items():
+        if table.schema.metadata.get(key) != value:
+            return None
+
+    df = table.to_pandas(date_as_object=False)
+    # Callers expect plain strings for the report names.  The compact layout
+    # keeps the dictionary column as a categorical instead.
+    if not compact_data:
+        df["report_name"] = df["report_name"].astype(object)
+
+    return df
+
+
+# Metadata used to tie the store to a specific version of the CSV
+def store_stamp(csv_stat):
+    return {
+        b"csv_mtime_ns": str(csv_stat.st_mtime_ns).encode(),
+        b"csv_size": str(csv_stat.st_size).encode(),
+    }
+
+
+# Shrink the master dataframe when compact_data is set, otherwise return it
+# as is.
+#   report_name - categorical, so each row holds a small code instead of a
+#       pointer to its own string.  Categories are sorted so sorting by
+#       report_name gives the same order as the plain strings.
+#   report_hash - dropped, nothing reads it after the download
+#   report_data - float32 if compact_float32 is set
+# Dates stay datetime64 - pandas can't hold them at day resolution and the
+# filters and charts need real dates.  The vintage index keeps its own day
+# numbers as int32 where they fit.
+def compact_fed_data(df):
+    if not compact_data:
+        return df
+
+    df = df.drop(columns=["report_hash"], errors="ignore")
+    names = df["report_name"]
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.cat.remove_unused_categories()
+        df["report_name"] = names.cat.reorder_categories(sorted(names.cat.categories))
+    else:
+        df["report_name"] = names.astype("category")
+    if compact_float32:
+        df["report_data"] = df["report_data"].astype("float32")
+
+    return df
+
+
+# Bytes used by each column of a dataframe, strings and all, plus a total
+# row.  Categorical columns count their codes and categories once.
+def memory_report(df):
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame(
+        {
+            "dtype": [str(df.index.dtype)] + [str(t) for t in df.dtypes],
+            "bytes": usage.values,
+        },
+        index=usage.index,
+    )
+    report.loc["total"] = ["", usage.sum()]
+    report["bytes_per_row"] = (report["bytes"] / max(len(df), 1)).round(1)
+    return report
+
+
 # Function to add report labels to the dataframe
-# ** Don't run this on the full data set - it's brutal
-# Run this on a subset to provide labels and context.
+# Labels come from the report registry and are attached with a single
+# vectorized map, so this is fine to run on the full data set.
+@mx.timed_stage
 def add_report_long_names(df1):
     df = df1.copy()
-    for index in df.index:
-        if df.loc[index, "report_name"] == "WM1NS":
-            df.loc[index, "report_long_name"] = "M1 Money Supply"
-            df.loc[index, "category"] = "Economy - Weekly"
-        if df.loc[index, "report_name"] == "WM2NS":
-            df.loc[index, "report_long_name"] = "M2 Money Supply"
-            df.loc[index, "category"] = "Economy - Weekly"
-        if df.loc[index, "report_name"] == "ICSA":
-            df.loc[index, "report_long_name"] = "Initial Unemployment"
-            df.loc[index, "category"] = "Employment - Weekly"
-        if df.loc[index, "report_name"] == "CCSA":
-            df.loc[index, "report_long_name"] = "Continued Unemployment"
-            df.loc[index, "category"] = "Employment - Weekly"
-        if df.loc[index, "report_name"] == "JTSJOL":
-            df.loc[index, "report_long_name"] = "Job Openings: Total Nonfarm"
-            df.loc[index, "category"] = "Employment"
-        if df.loc[index, "report_name"] == "PAYEMS":
-            df.loc[index, "report_long_name"] = "Non-Farm Employment"
-            df.loc[index, "category"] = "Employment"
-        if df.loc[index, "report_name"] == "NPPTTL":
-            df.loc[
-                index, "report_long_name"
-            ] = "Total Nonfarm Private Payroll Employment (ADP)"
-            df.loc[index, "category"] = "Employment"
-        if df.loc[index, "report_name"] == "RSXFS":
-            df.loc[index, "report_long_name"] = "Retail Sales"
-            df.loc[index, "category"] = "Economy"
-        if df.loc[index, "report_name"] == "TCU":
-            df.loc[index, "report_long_name"] = "Capacity Utilization"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "UMCSENT":
-            df.loc[index, "report_long_name"] = "Consumer Sentiment Index"
-            df.loc[index, "category"] = "Economy"
-        if df.loc[index, "report_name"] == "BUSINV":
-            df.loc[index, "report_long_name"] = "Business Inventories"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "INDPRO":
-            df.loc[index, "report_long_name"] = "Industrial Production Index"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPG331S":
-            df.loc[index, "report_long_name"] = "Primary Metal Production"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPG332S":
-            df.loc[index, "report_long_name"] = "Fabricated Metal Products Production"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPG334S":
-            df.loc[
-                index, "report_long_name"
-            ] = "Computer and Electronic Products Production"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPG335S":
-            df.loc[
-                index, "report_long_name"
-            ] = "Electrical Equipment, Appliance, and Component Production"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPG3361T3S":
-            df.loc[index, "report_long_name"] = "Motor Vehicles and Parts Production"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPMINE":
-            df.loc[
-                index, "report_long_name"
-            ] = "Mining, Quarrying, and Oil and Gas Extraction Production"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "GACDFSA066MSFRBPHI":
-            df.loc[index, "report_long_name"] = "Philidelphia Fed Manufacturing Index"
-            df.loc[index, "category"] = "Manufacturing"
-        if df.loc[index, "report_name"] == "GACDISA066MSFRBNY":
-            df.loc[index, "report_long_name"] = "Empire State Manufacturing Index"
-            df.loc[index, "category"] = "Manufacturing"
-        if df.loc[index, "report_name"] == "BACTSAMFRBDAL":
-            df.loc[index, "report_long_name"] = "Texas Fed Manufacturing Index"
-            df.loc[index, "category"] = "Manufacturing"
-        if df.loc[index, "report_name"] == "IR":
-            df.loc[index, "report_long_name"] = "Import Price Index"
-            df.loc[index, "category"] = "Economy"
-        if df.loc[index, "report_name"] == "IQ":
-            df.loc[index, "report_long_name"] = "Export Price Index"
-            df.loc[index, "category"] = "Economy"
-        if df.loc[index, "report_name"] == "PPIACO":
-            df.loc[index, "report_long_name"] = "Producer Price Index (All)"
-            df.loc[index, "category"] = "Inflation"
-        if df.loc[index, "report_name"] == "PCUOMINOMIN":
-            df.loc[index, "report_long_name"] = "Producer Price Index Mining"
-            df.loc[index, "category"] = "Inflation"
-        if df.loc[index, "report_name"] == "CPIAUCSL":
-            df.loc[index, "report_long_name"] = "Consumer Price Index (All)"
-            df.loc[index, "category"] = "Inflation"
-        if df.loc[index, "report_name"] == "CPILFESL":
-            df.loc[index, "report_long_name"] = "Consumer Price Index (Core)"
-            df.loc[index, "category"] = "Inflation"
-        if df.loc[index, "report_name"] == "MICH":
-            df.loc[index, "report_long_name"] = "U of M: Inflation Expectation"
-            df.loc[index, "category"] = "Inflation"
-        if df.loc[index, "report_name"] == "AMDMUO":
-            df.loc[
-                index, "report_long_name"
-            ] = "Manufacturers Unfilled Orders: Durable Goods"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "AMTMUO":
-            df.loc[
-                index, "report_long_name"
-            ] = "Manufacturers Unfilled Orders: Total Manufacturing"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "ANXAUO":
-            df.loc[
-                index, "report_long_name"
-            ] = "Manufacturers Unfilled Orders: Nondefense Capital Goods Excluding Aircraft"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "AMVPUO":
-            df.loc[
-                index, "report_long_name"
-            ] = "Manufacturers Unfilled Orders: Motor Vehicles and Parts"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPB53122S":
-            df.loc[
-                index, "report_long_name"
-            ] = "Industrial Production: Durable Goods Materials: Semiconductors, Printed Circuit Boards, and Other"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPG3254N":
-            df.loc[
-                index, "report_long_name"
-            ] = "Industrial Production: Manufacturing: Non-Durable Goods: Pharmaceutical and Medicine"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPDMAN":
-            df.loc[
-                index, "report_long_name"
-            ] = "Industrial Production: Durable Manufacturing"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "IPFINAL":
-            df.loc[index, "report_long_name"] = "Industrial Production: Final Products"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "CSCICP03USM665S":
-            df.loc[
-                index, "report_long_name"
-            ] = "Consumer Opinion Surveys: Confidence Indicators"
-            df.loc[index, "category"] = "Economy"
-        if df.loc[index, "report_name"] == "MNFCTRIRSA":
-            df.loc[
-                index, "report_long_name"
-            ] = "Manufacturers: Inventories to Sales Ratio"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "DGORDER":
-            df.loc[index, "report_long_name"] = "Manufacturer New Orders: Durable Goods"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "NEWORDER":
-            df.loc[
-                index, "report_long_name"
-            ] = "Manufacturer New Orders: Nondefense Capital Goods Excluding Aircraft"
-            df.loc[index, "category"] = "Production"
-        if df.loc[index, "report_name"] == "JTSQUL":
-            df.loc[index, "report_long_name"] = "Job Quits: Total Nonfarm"
-            df.loc[index, "category"] = "Employment"
+    df["report_long_name"] = map_report_names(df["report_name"], rr.report_long_names)
+    df["category"] = map_report_names(df["report_name"], rr.report_categories)
 
     return df
 
 
+# Map report names through one of the registry dicts.  Categorical names
+# (see compact_fed_data) only map their categories and the result stays
+# categorical.
+def map_report_names(names, mapping):
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        return names.map(mapping)
+    mapped, values = pd.factorize(names.cat.categories.map(mapping))
+    # -1 (a missing name) picks the -1 tacked on the end
+    codes = np.r_[mapped, -1][names.cat.codes.values]
+    return pd.Series(pd.Categorical.from_codes(codes, values), index=names.index)
+
+
 # Functions to allow for easier filtering later
 # These can be used indpendently as long as the get_fed_data function
 # has been called.
@@ -232,60 +397,142 @@ def add_report_long_names(df1):
 # The dataframe is copied - pandas yells if we work off a slice
 # The function occurs and the result is sorted and index is reset
 
+# df1 can also be a store handle from get_fed_source, in which case the
+# filter is pushed down into the store's query and the result is the
+# matching slice only
+
 # function to pull specific report
+@mx.timed_stage
 def get_report_from_fed_data(df1, report_name):
-    df = df1.copy()
-    df = df[df["report_name"] == report_name]
-    df.sort_values(by=["report_date"], inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    return select_fed_data(df1, report_name=report_name)
 
 
 # function to pull a specific report_date
+@mx.timed_stage
 def get_report_date_from_fed_data(df1, report_date):
-    df = df1.copy()
-    df1 = df[df["report_date"] == report_date]
-    df.sort_values(by=["report_date"], inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    return select_fed_data(df1, report_date=report_date)
 
 
 # function to pull reports after report_date
+@mx.timed_stage
 def get_report_after_date_fed_data(df1, report_date):
-    df = df1.copy()
-    df = df[df["report_date"] >= report_date]
-    df.sort_values(by=["report_date"], inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    return select_fed_data(df1, after_report_date=report_date)
 
 
 # function to pull a specific release_date
+@mx.timed_stage
 def get_release_date_from_fed_data(df1, release_date):
-    df = df1.copy()
-    df = df[df["release_date"] == release_date]
-    df.sort_values(by=["report_date"], inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    return select_fed_data(df1, release_date=release_date)
 
 
 # function to pull release_dates after a date
+@mx.timed_stage
 def get_release_after_date_fed_data(df1, release_date):
-    df = df1.copy()
-    df = df[df["release_date"] >= release_date]
-    df.sort_values(by=["report_date"], inplace=True)
+    return select_fed_data(df1, after_release_date=release_date)
+
+
+# Shared filter for the helpers above.  Filters are the same as
+# sqlite_store.query_fed_data.
+def select_fed_data(df1, **filters):
+    if isinstance(df1, ss.FedStore):
+        df = compact_fed_data(format_fed_data(df1.query(**filters)))
+    else:
+        mask = np.ones(len(df1), dtype=bool)
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key == "report_name":
+                mask &= (df1["report_name"] == value).values
+                continue
+            column = key.replace("after_", "").replace("until_", "")
+            if key.startswith("after_"):
+                mask &= (df1[column] >= value).values
+            elif key.startswith("until_"):
+                mask &= (df1[column] <= value).values
+            else:
+                mask &= (df1[column] == value).values
+        df = df1[mask].copy()
+
+    df.sort_values(by=["report_date"], kind="mergesort", inplace=True)
     df.reset_index(drop=True, inplace=True)
     return df
 
 
+# Index based lookups
+# The master dataframe is sorted once by report_name and report_date and we
+# keep the row boundaries for each report.  Lookups are then just slices of
+# the sorted frame - no copy, no full scan and no re-sort.  The slices are
+# views so copy them before modifying.
+
+# function to sort the master dataframe and build the report index
+def build_report_index(df1):
+    df = df1.sort_values(by=["report_name", "report_date"], kind="mergesort")
+    df.reset_index(drop=True, inplace=True)
+
+    names = df["report_name"].values
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+    stops = np.r_[starts[1:], len(df)]
+    index = {names[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+    return df, index
+
+
+# function to fingerprint the content of every report in the indexed master
+# dataframe.  Returns a dict of report_name to a number that changes when
+# any of the report's rows change.
+def get_report_hashes(df, index):
+    if not index:
+        return {}
+    hashed = pd.util.hash_pandas_object(
+        df[["report_date", "release_date", "report_data"]], index=False
+    ).values
+    names = list(index)
+    starts = [index[name][0] for name in names]
+    sums = np.add.reduceat(hashed, starts)
+    return {name: int(total) for name, total in zip(names, sums)}
+
+
+# function to pull a specific report out of the indexed master dataframe
+@mx.timed_stage
+def get_report_from_index(df, index, report_name):
+    start, stop = index.get(report_name, (0, 0))
+    return df.iloc[start:stop]
+
+
+# function to pull reports after report_date from a slice sorted by
+# report_date - binary search instead of a mask
+def get_sorted_report_after_date(df, report_date):
+    cut = pd.Timestamp(report_date).to_datetime64()
+    return df.iloc[df["report_date"].values.searchsorted(cut) :]
+
+
+# function to pull release_dates after a date from a slice sorted by
+# report_date.  Release dates aren't sorted so this is still a mask, but the
+# report_date order is kept so there's no need to sort again.
+def get_sorted_release_after_date(df, release_date):
+    cut = pd.Timestamp(release_date).to_datetime64()
+    return df[df["release_date"].values >= cut]
+
+
+# function to drop releases after a date - what was known as of that date
+def get_release_as_of_date(df, release_date):
+    cut = pd.Timestamp(release_date).to_datetime64()
+    return df[df["release_date"].values <= cut]
+
+
 # Setup a function for calculating rates of change
+@mx.timed_stage
 def period_change(df):
     df["period_change"] = df.report_data.pct_change()
-    df["relative_change"] = 1 - df.iloc[0].report_data / df.report_data
+    # Nothing may have been released yet when looking at an early as-of date
+    first = df.report_data.iloc[0] if len(df) else np.nan
+    df["relative_change"] = 1 - first / df.report_data
     return df
 
 
 # function to return a dataframe with only a single report with the latest
 # data as updated
+@mx.timed_stage
 def get_latest_data(df1):
     df = df1.copy()
     df = df.sort_values("release_date").groupby("report_date").tail(1)
@@ -294,36 +541,561 @@ def get_latest_data(df1):
     return df
 
 
+# function to build the latest vintage of every report / report_date in one
+# pass over the whole dataset - the same result as running get_latest_data
+# on each report
+@mx.timed_stage
+def build_latest_data(df1):
+    df = df1.sort_values(
+        by=["report_name", "report_date", "release_date"], kind="mergesort"
+    )
+    df = df.drop_duplicates(["report_name", "report_date"], keep="last")
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+# Point-in-time lookups
+# Every report_date of every report has one or more vintages.  What was
+# known as of a date is, for each report_date, the last vintage released on
+# or before it.  Rows are sorted by (report, report_date, release_date) once
+# and each row gets the key
+#     group * span + release day
+# where group numbers the (report, report_date) pairs.  Keys are then sorted
+# across the whole table, so the vintage known as of a date for any set of
+# groups is a single searchsorted - O(log n) per report_date, no filtering
+# or regrouping.  Many as-of dates at once is the same search broadcast
+# over a grid of keys.
+class VintageIndex:
+    def __init__(self, df):
+        self.df = df
+        codes, names = pd.factorize(df["report_name"], sort=True)
+        report_dates = df["report_date"].values
+        release_days = df["release_date"].values.astype("datetime64[D]").astype("int64")
+        # Row numbers and keys are int32 when they fit, which they do for
+        # anything short of billions of rows
+        self.order = np.lexsort((release_days, report_dates, codes)).astype(
+            index_dtype(len(df))
+        )
+
+        codes = codes[self.order]
+        report_dates = report_dates[self.order]
+        release_days = release_days[self.order]
+
+        # A new group starts at every change of report or report_date
+        new_group = np.r_[
+            True,
+            (codes[1:] != codes[:-1]) | (report_dates[1:] != report_dates[:-1]),
+        ]
+        group = np.cumsum(new_group) - 1
+        self.group_starts = np.flatnonzero(new_group).astype(self.order.dtype)
+        self.group_dates = report_dates[self.group_starts]
+
+        # Range of groups belonging to each report
+        group_codes = codes[self.group_starts]
+        starts = np.flatnonzero(np.r_[True, group_codes[1:] != group_codes[:-1]])
+        stops = np.r_[starts[1:], len(group_codes)]
+        self.report_groups = {
+            names[group_codes[start]]: (start, stop)
+            for start, stop in zip(starts, stops)
+        }
+
+        # Keys leave room for one day either side of the release range so
+        # as-of dates outside it can be clipped in without landing in a
+        # neighbouring group
+        if len(release_days):
+            self.first_day = release_days.min()
+            self.span = release_days.max() - self.first_day + 2
+        else:
+            self.first_day, self.span = 0, 2
+        self.keys = (group * self.span + (release_days - self.first_day)).astype(
+            index_dtype(len(self.group_starts) * self.span)
+        )
+
+    # Row positions (into df) of the vintage known as of each date for each
+    # group, or -1 where nothing had been released yet.  groups and as_of
+    # broadcast against each other.
+    def lookup(self, groups, as_of):
+        days = np.asarray(as_of, dtype="datetime64[D]").astype("int64")
+        days = np.clip(days - self.first_day, -1, self.span - 2)
+        keys = (groups * self.span + days).astype(self.keys.dtype)
+        idx = np.searchsorted(self.keys, keys, side="right") - 1
+        found = idx >= self.group_starts[groups]
+        return np.where(found, self.order[np.maximum(idx, 0)], -1)
+
+    def groups(self, report_name=None):
+        if report_name is None:
+            return np.arange(len(self.group_starts))
+        start, stop = self.report_groups.get(report_name, (0, 0))
+        return np.arange(start, stop)
+
+    # Every report_date of a report (or of every report) as it was known on
+    # as_of, in the same layout as build_latest_data
+    @mx.timed_stage
+    def as_of(self, as_of, report_name=None):
+        rows = self.lookup(self.groups(report_name), as_of_day(as_of))
+        df = self.df.iloc[rows[rows >= 0]]
+        return df.reset_index(drop=True)
+
+    # Values of a report's report_dates as known on each of many dates -
+    # one row per report_date and one column per as-of date, NaN where the
+    # report_date hadn't been released yet.  This is what backtests want.
+    @mx.timed_stage
+    def as_of_matrix(self, report_name, as_of_dates):
+        groups = self.groups(report_name)
+        dates = pd.DatetimeIndex(as_of_dates)
+        rows = self.lookup(groups[:, None], dates.values[None, :])
+        values = self.df["report_data"].values.astype("float64")
+        matrix = np.where(rows >= 0, values[np.maximum(rows, 0)], np.nan)
+        return pd.DataFrame(
+            matrix,
+            index=pd.DatetimeIndex(self.group_dates[groups], name="report_date"),
+            columns=dates,
+        )
+
+    # Bytes held by the index arrays (the dataframe it points into isn't
+    # counted)
+    def nbytes(self):
+        return (
+            self.order.nbytes
+            + self.keys.nbytes
+            + self.group_starts.nbytes
+            + self.group_dates.nbytes
+        )
+
+
+# Smallest integer type that can hold values below bound
+def index_dtype(bound):
+    return np.int32 if bound < 2**31 else np.int64
+
+
+# An as-of date as a numpy day
+def as_of_day(as_of):
+    return np.datetime64(pd.Timestamp(as_of).date(), "D")
+
+
 # function to pull out data by larger category and normalize each report
 # independently.  This assumes the master dataframe is passed in along
 # with the report and a start_date.
+# All the reports in the category are worked out together - one filter,
+# one latest vintage sort and grouped changes - rather than scanning the
+# whole frame again for each report.  Reports come out in the order they
+# first appear in df1.
+@mx.timed_stage
 def get_category_data_from_fed_data(df1, report_name, report_date):
-    df = df1.copy()
-    # we need to form a list of unique reports and their categories
-    master_list = df["report_name"].unique()
-    master_list = pd.DataFrame(master_list, columns=["report_name"])
-    master_list = add_report_long_names(master_list)
-    # Grab only the reports based on the report_name from the list
-    filtered_list = master_list[master_list["report_name"] == report_name]
-    filtered_list = master_list[
-        master_list["category"] == filtered_list.category.iloc[0]
+    category = rr.report_categories.get(report_name)
+    names = [
+        name
+        for name in pd.unique(df1["report_name"].values)
+        if category is not None and rr.report_categories.get(name) == category
     ]
+    cut = pd.Timestamp(report_date).to_datetime64()
+    mask = df1["report_name"].isin(names).values & (df1["report_date"].values >= cut)
+    df = df1[mask]
+
+    df_out = category_changes(df, names)
+    df_out["period_change"] = df_out["period_change"].fillna(0)
+
+    return add_report_long_names(df_out)
+
+
+# Latest vintage of each report in df1 with its period and relative
+# changes, reports in the order of names
+def category_changes(df1, names):
+    df = build_latest_data(df1)
+    order = pd.Categorical(df["report_name"], categories=names).codes
+    df = df.iloc[np.argsort(order, kind="mergesort")]
+    df.reset_index(drop=True, inplace=True)
+
+    # Rows are grouped by report, so each report's first value is the one
+    # at the start of its run
+    codes = np.sort(order, kind="mergesort")
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    group = np.cumsum(first) - 1
+    values = df["report_data"].values
+    df["period_change"] = df.groupby(group, sort=False)["report_data"].pct_change()
+    df["relative_change"] = 1 - values[first][group] / values
+
+    return df
+
+
+# Category cubes
+# The category surfaces compare every report in a category over time.  At
+# load time we build one wide matrix per category (report_date x
+# report_name) of the latest vintage values.  A surface is then just a
+# slice of that matrix from the start date plus some vectorized math.
+
+# function to build the category cubes from the latest vintage data - see
+# build_latest_data.  With more than one worker (see category_workers) each
+# category is pivoted on its own and the categories are spread over a
+# thread pool.  Either way categories come out in the order of their first
+# report name.
+@mx.timed_stage
+def build_category_cubes(df, workers=None):
+    if workers is None:
+        workers = category_workers
+    if workers > 1:
+        return build_category_cubes_threaded(df, workers)
+
+    wide = df.pivot(index="report_date", columns="report_name", values="report_data")
+    # Plain names even if report_name is categorical
+    wide.columns = wide.columns.astype(object)
+
+    cubes = {}
+    categories = wide.columns.map(rr.report_categories)
+    for category in categories.dropna().unique():
+        cube = wide.loc[:, categories == category]
+        cubes[category] = cube.dropna(how="all")
+
+    return cubes
 
-    df_out = pd.DataFrame()
-    for index, row in filtered_list.iterrows():
-        temp_df = get_report_from_fed_data(df, row.report_name)
-        temp_df = get_report_after_date_fed_data(temp_df, report_date)
-        temp_df = get_latest_data(temp_df)
-        temp_df = period_change(temp_df)
-        temp_df = add_report_long_names(temp_df)
-        df_out = df_out.append(
-            temp_df,
-            ignore_index=True,
+
+def build_category_cubes_threaded(df, workers):
+    categories = df["report_name"].map(rr.report_categories)
+    parts = dict(list(df.groupby(categories.values, sort=False)))
+    names = sorted(str(name) for name in pd.unique(df["report_name"]))
+    order = list(
+        dict.fromkeys(
+            rr.report_categories[name]
+            for name in names
+            if rr.report_categories.get(name) in parts
         )
+    )
 
-    df_out["period_change"] = df_out["period_change"].fillna(0)
+    with ThreadPoolExecutor(max_workers=min(workers, len(order) or 1)) as pool:
+        cubes = pool.map(lambda category: category_cube(parts[category]), order)
+        return dict(zip(order, cubes))
+
+
+# One category's rows as a wide report_date x report_name matrix
+def category_cube(df):
+    # Plain names even if report_name is categorical
+    names = df["report_name"].astype(object)
+    wide = df.assign(report_name=names).pivot(
+        index="report_date", columns="report_name", values="report_data"
+    )
+    wide.columns = wide.columns.astype(object)
+    return wide.dropna(how="all")
+
+
+# function to slice the cube for a report's category from a start date
+# Returns the category name and the slice, which is empty if nothing in the
+# category had been released by the as-of date the cubes were built for
+@mx.timed_stage
+def get_category_cube(cubes, report_name, report_date):
+    category = rr.report_categories.get(report_name)
+    cube = cubes.get(category)
+    if cube is None:
+        cube = pd.DataFrame(index=pd.DatetimeIndex([], name="report_date"))
+    cut = pd.Timestamp(report_date).to_datetime64()
+    cube = cube.iloc[cube.index.values.searchsorted(cut) :]
+    cube = cube.dropna(how="all")
+    return category, cube
+
+
+# Change from the previous observation of each report.  Reports don't all
+# share dates so we compare against the last value the report actually had.
+@mx.timed_stage
+def category_period_change(cube):
+    prior = cube.ffill().shift(1)
+    df = cube / prior - 1
+    # A report's first value has nothing before it
+    df = df.mask(cube.notna() & prior.isna(), 0)
+    return df
+
+
+# Change relative to each report's first value in the slice
+@mx.timed_stage
+def category_relative_change(cube):
+    if cube.empty:
+        return cube.copy()
+    return 1 - cube.bfill().iloc[0] / cube
+
+
+#############################################################################
+# Trendlines
+#############################################################################
+"""
+    The raw data chart gets a smoothed trendline.  Running a full lowess on
+    every render is slow for the weekly series with lots of vintages, so by
+    default the data is binned onto a fixed grid and the local fits are
+    done on the bins with a couple of small matrix products.  The cost
+    depends on the grid size rather than the number of points.
+
+    Unlike statsmodels the binned lowess sizes its windows by date range
+    rather than by counting nearest neighbours and skips the robustness
+    iterations.
+"""
+
+
+# function to compute a trendline through the points (x, y)
+# x is datetime64 and y is numeric.  Returns the trendline x and y arrays.
+@mx.timed_stage
+def smooth_trendline(
+    x,
+    y,
+    method=trendline_method,
+    bandwidth=trendline_bandwidth,
+    points=trendline_points,
+):
+    x = np.asarray(x, dtype="datetime64[ns]")
+    y = np.asarray(y, dtype="float64")
+    keep = ~np.isnat(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    if method == "none" or len(x) < 3:
+        return x[:0], y[:0]
+
+    # Work in days from the first date
+    origin = x.min()
+    days = (x - origin) / np.timedelta64(1, "D")
+    span = days.max()
+    if span == 0:
+        return x[:0], y[:0]
+
+    if method == "lowess":
+        from statsmodels.nonparametric.smoothers_lowess import lowess
+
+        fit = lowess(y, days, frac=bandwidth)
+        return origin + (fit[:, 0] * 86400e9).astype("timedelta64[ns]"), fit[:, 1]
+
+    # Bin the points onto the grid
+    grid = np.linspace(0, span, points)
+    bins = np.rint(days / span * (points - 1)).astype(int)
+    count = np.bincount(bins, minlength=points)
+    sum_x = np.bincount(bins, days, minlength=points)
+    sum_y = np.bincount(bins, y, minlength=points)
+    sum_xx = np.bincount(bins, days * days, minlength=points)
+    sum_xy = np.bincount(bins, days * y, minlength=points)
+
+    # Weight of every bin for the fit at every grid point.  Each window
+    # covers the bandwidth share of the range, so near the ends it widens
+    # to the inside the way a nearest neighbour window would.
+    width = bandwidth * span
+    half_width = np.maximum(width / 2, width - np.minimum(grid, span - grid))
+    dist = (grid[:, None] - grid[None, :]) / half_width[:, None]
+    if method == "kernel":
+        weights = np.exp(-2 * dist**2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fit = (weights @ sum_y) / (weights @ count)
+    elif method == "binned_lowess":
+        weights = np.clip(1 - np.abs(dist) ** 3, 0, None) ** 3
+        s0 = weights @ count
+        s1 = weights @ sum_x
+        s2 = weights @ sum_xx
+        t0 = weights @ sum_y
+        t1 = weights @ sum_xy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            denom = s0 * s2 - s1 * s1
+            slope = np.where(
+                np.abs(denom) > 1e-9 * s0 * s2, (s0 * t1 - s1 * t0) / denom, 0
+            )
+            fit = (t0 - slope * s1) / s0 + slope * grid
+    else:
+        raise ValueError("Unknown trendline method: " + str(method))
+
+    keep = np.isfinite(fit)
+    return origin + (grid[keep] * 86400e9).astype("timedelta64[ns]"), fit[keep]
 
-    return df_out
+
+#############################################################################
+# Downsampling
+#############################################################################
+"""
+    Long histories make for big figures and a sluggish browser.  Time series
+    are cut down to the point budget with Largest-Triangle-Three-Buckets,
+    which keeps the peaks and troughs that make a series look the way it
+    does.  When a chart is zoomed the callback asks for just that window so
+    the detail comes back as you zoom in.
+"""
+
+
+# function to pick the indices of up to threshold points with LTTB
+# x and y must be sorted by x
+def lttb_indices(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x).astype("float64")
+    y = np.nan_to_num(np.asarray(y, dtype="float64"))
+
+    # First and last points are always kept, the rest are split into buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    edges = np.r_[edges, n]
+    out = np.empty(threshold, dtype=int)
+    out[0] = 0
+    out[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x = x[stop : edges[i + 2]].mean()
+        next_y = y[stop : edges[i + 2]].mean()
+        # Keep the point making the biggest triangle with the last kept point
+        # and the average of the next bucket
+        area = np.abs(
+            (x[a] - next_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (next_y - y[a])
+        )
+        a = start + np.argmax(area)
+        out[i + 1] = a
+
+    return out
+
+
+# function to cut a frame sorted by x_col down to the point budget, optionally
+# limited to a (start, end) window of x first
+@mx.timed_stage
+def downsample_frame(df, x_col, y_col, threshold=None, window=None):
+    if threshold is None:
+        threshold = chart_point_budget
+    if window is not None:
+        x = df[x_col].values
+        start = x.searchsorted(pd.Timestamp(window[0]).to_datetime64())
+        stop = x.searchsorted(pd.Timestamp(window[1]).to_datetime64(), side="right")
+        df = df.iloc[start:stop]
+    if len(df) <= threshold:
+        return df
+    return df.iloc[lttb_indices(df[x_col].values, df[y_col].values, threshold)]
+
+
+# function to pull the zoomed x range out of a graph's relayoutData
+# Returns (start, end), "reset" when zoomed back out, or None when the
+# relayout had nothing to do with the x range (drawing shapes, resizing).
+def relayout_window(relayout_data):
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange"):
+        return "reset"
+    if "xaxis.range[0]" in relayout_data:
+        return (relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"])
+    if "xaxis.range" in relayout_data:
+        return tuple(relayout_data["xaxis.range"])
+    return None
+
+
+#############################################################################
+# Payload helpers
+#############################################################################
+"""
+    Figures go to the browser as JSON so every character counts.  Plotly
+    writes datetime64[ns] values out with a full time part, and computed
+    changes come with a long tail of digits nobody can see on a chart.
+    These trim both before the arrays go into a figure.
+"""
+
+
+# A date for a chart title - blank when there's no data, e.g. an as-of date
+# before anything was released
+def title_date(value):
+    if pd.isna(value):
+        return ""
+    return value.strftime("%Y-%m-%d")
+
+
+# Dates as plain YYYY-MM-DD strings - less than half the size of the
+# default timestamp strings and read the same by plotly
+def compact_dates(values):
+    return np.datetime_as_string(np.asarray(values, dtype="datetime64[D]"), unit="D")
+
+
+# Round computed values to what's worth sending
+def compact_values(values):
+    return np.round(np.asarray(values, dtype="float64"), payload_decimals)
+
+
+# Pick up to colorbar_ticks evenly spread release dates to label the
+# colorbar instead of labelling every point
+def release_ticks(release_int):
+    ticks = np.unique(release_int)
+    if len(ticks) > colorbar_ticks:
+        ticks = ticks[
+            np.linspace(0, len(ticks) - 1, colorbar_ticks).round().astype(int)
+        ]
+    labels = pd.to_datetime(ticks, unit="s").strftime("%m/%d/%Y")
+    return ticks, labels
+
+
+#############################################################################
+# Figure Cache
+#############################################################################
+"""
+    Users tend to flip between a handful of popular reports and start dates,
+    so rendered figures are kept in a bounded LRU cache.  Entries are keyed
+    on (chart type, report, start date, data version), where the data
+    version identifies the content of the data the chart was drawn from.
+    Charts of a whole category are keyed on the category name in place of
+    the report.  When the data reloads, only the entries for reports (and
+    categories) whose data changed are dropped - see invalidate.
+
+    Size is approximated by the length of the figure's JSON, which is what
+    Dash ends up sending to the browser anyway.
+"""
+
+
+class FigureCache:
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    # Return the cached figure or build, cache and return it.  build is
+    # only called on a miss.
+    def get_or_build(self, chart_type, report, start_date, version, build):
+        key = (chart_type, report, start_date, version)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        fig = build()
+        size = len(fig.to_json())
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (fig, size)
+            self.total_bytes += size
+            while self.entries and (
+                len(self.entries) > self.max_entries
+                or self.total_bytes > self.max_bytes
+            ):
+                self.total_bytes -= self.entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+        return fig
+
+    # Drop every figure drawn for the given reports
+    def invalidate(self, reports):
+        reports = set(reports)
+        with self.lock:
+            for key in [key for key in self.entries if key[1] in reports]:
+                self.total_bytes -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+figure_cache = FigureCache(figure_cache_entries, figure_cache_bytes)
 
 
 #############################################################################
@@ -331,29 +1103,58 @@ def get_category_data_from_fed_data(df1, report_name, report_date):
 #############################################################################
 # Basic chart for direct values
 # Assumes report is pre-filtered so dataset only has one report - see callback
-def basic_chart(df, long_name):
+# trend is an optional (x, y) trendline - see smooth_trendline
+@mx.timed_chart
+def basic_chart(df1, long_name, trend=None, webgl=False):
+    # plotly.express is slow to import and only used here
+    import plotly.express as px
+
+    df = df1.copy()
     # Add some color to the various release dates
     # Since the marker_color needs an array of ints, we do a conversion to
     # seconds since the epoch
     df["release_int"] = (df.release_date - pd.Timestamp("1970-01-01")) // pd.Timedelta(
         "1s"
     )
+    tickvals, ticktext = release_ticks(df.release_int.values)
+    df["report_date"] = compact_dates(df.report_date)
 
     fig = px.scatter(
         df,
         x="report_date",
         y="report_data",
-        trendline="lowess",
+        render_mode="webgl" if webgl else "svg",
         color="release_int",
         color_continuous_scale=px.colors.sequential.YlOrRd_r,
-        hover_name="report_long_name",
-        hover_data={
-            "release_int": False,
-            "release_date": "| %b %d, %Y",
-            "category": True,
-        },
     )
 
+    # The long name and category are the same for every point, so they go
+    # in the hover template once rather than in an array per point
+    category = df.category.iloc[0] if len(df) else ""
+    fig.update_traces(
+        customdata=compact_dates(df.release_date),
+        hovertemplate="<b>"
+        + long_name
+        + "</b><br><br>report_date=%{x}<br>report_data=%{y}"
+        + "<br>release_date=%{customdata| %b %d, %Y}"
+        + "<br>category="
+        + str(category)
+        + "<extra></extra>",
+    )
+
+    if trend is not None and len(trend[0]):
+        fig.add_traces(
+            go.Scatter(
+                x=compact_dates(trend[0]),
+                y=compact_values(trend[1]),
+                mode="lines",
+                name="Trendline",
+                line_color="#636efa",
+                hoverinfo="skip",
+                showlegend=False,
+            )
+        )
+
     fig.update_layout(
         newshape=dict(line_color="yellow"),
         title=(long_name + " Raw Data"),
@@ -364,8 +1165,8 @@ def basic_chart(df, long_name):
             thicknessmode="pixels",
             thickness=50,
             tickmode="array",
-            tickvals=df.release_int,
-            ticktext=df.release_date.dt.strftime("%m/%d/%Y"),
+            tickvals=tickvals,
+            ticktext=ticktext,
             ticks="inside",
         ),
     )
@@ -376,12 +1177,14 @@ def basic_chart(df, long_name):
 # Chart for displaying change since the baseline
 # We need a dataframe with only one distinct report_date per period
 # filter for only the latest release_date
-def baseline_change_chart(df, long_name):
+@mx.timed_chart
+def baseline_change_chart(df, long_name, webgl=False):
+    scatter = go.Scattergl if webgl else go.Scatter
     fig = go.Figure(layout=lc.layout)
     fig.add_traces(
-        go.Scatter(
-            x=df.report_date,
-            y=df.relative_change,
+        scatter(
+            x=compact_dates(df.report_date),
+            y=compact_values(df.relative_change),
             name="Baseline",
             line_width=2,
             fill="tozeroy",
@@ -401,12 +1204,14 @@ def baseline_change_chart(df, long_name):
 
 # Chart for displaying change since the last value
 # Same as above chart
-def periodic_change_chart(df, long_name):
+@mx.timed_chart
+def periodic_change_chart(df, long_name, webgl=False):
+    scatter = go.Scattergl if webgl else go.Scatter
     fig = go.Figure(layout=lc.layout)
     fig.add_traces(
-        go.Scatter(
-            x=df.report_date,
-            y=df.period_change,
+        scatter(
+            x=compact_dates(df.report_date),
+            y=compact_values(df.period_change),
             name="Relative",
             line_width=2,
             fill="tozeroy",
@@ -425,17 +1230,16 @@ def periodic_change_chart(df, long_name):
 
 
 # Chart of category changes period-to-period
-def category_chart_perodic(df1, report_name, report_date):
-    # Start with the data
-    df = get_category_data_from_fed_data(df1, report_name, report_date)
+# Takes a category cube of period changes (report_date x report_name) - see
+# category_period_change
+@mx.timed_chart
+def category_chart_perodic(df, category):
 
     # Dynamically build out the chart from the dataframe
     # The official docs don't show this, but it works.
-    x_data = df["report_date"].unique()
-    y_data = df["report_long_name"].unique()
-    z_data = []
-    for i in y_data:
-        z_data.append(df[df["report_long_name"] == i]["period_change"] * 100)
+    x_data = df.index
+    y_data = df.columns.map(rr.report_long_names)
+    z_data = compact_values(df.values.T * 100)
 
     fig = go.Figure(
         go.Surface(
@@ -449,16 +1253,15 @@ def category_chart_perodic(df1, report_name, report_date):
                     "color": "black",
                 },
             },
-            x=x_data,
+            x=compact_dates(x_data),
             y=y_data,
             z=z_data,
         )
     )
 
     # Title Formatting
-    category = df.category.iloc[0]
-    begin_date = np.datetime_as_string(x_data.min(), unit="D")
-    end_date = np.datetime_as_string(x_data.max(), unit="D")
+    begin_date = title_date(x_data.min())
+    end_date = title_date(x_data.max())
 
     fig.update_layout(
         title=category
@@ -484,14 +1287,11 @@ def category_chart_perodic(df1, report_name, report_date):
 
 
 # Chart of category changes period-to-period - see above
-def category_chart_baseline(df1, report_name, report_date):
-    df = get_category_data_from_fed_data(df1, report_name, report_date)
-
-    x_data = df["report_date"].unique()
-    y_data = df["report_long_name"].unique()
-    z_data = []
-    for i in y_data:
-        z_data.append(df[df["report_long_name"] == i]["relative_change"] * 100)
+@mx.timed_chart
+def category_chart_baseline(df, category):
+    x_data = df.index
+    y_data = df.columns.map(rr.report_long_names)
+    z_data = compact_values(df.values.T * 100)
 
     fig = go.Figure(
         go.Surface(
@@ -505,15 +1305,14 @@ def category_chart_baseline(df1, report_name, report_date):
                     "color": "black",
                 },
             },
-            x=x_data,
+            x=compact_dates(x_data),
             y=y_data,
             z=z_data,
         )
     )
 
-    category = df.category.iloc[0]
-    begin_date = np.datetime_as_string(x_data.min(), unit="D")
-    end_date = np.datetime_as_string(x_data.max(), unit="D")
+    begin_date = title_date(x_data.min())
+    end_date = title_date(x_data.max())
 
     fig.update_layout(
         title=category
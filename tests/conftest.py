@@ -0,0 +1,16 @@
+"""
+    Shared setup for the tests.  The app modules live in the repository
+    root and the downloader in data_miner, neither of which is a package,
+    so both go on the path the same way the benchmarks do it.
+
+    Run from the repository root with:
+
+        python -m pytest -q tests
+
+"""
+import os
+import sys
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(repo_dir)
+sys.path.append(os.path.join(repo_dir, "data_miner"))
@@ -0,0 +1,103 @@
+"""
+    The downloader's incremental pull against fred_stub_server running in
+    process - a repeat pull adds nothing and a revised value replaces the
+    stored row with the same key.
+"""
+import threading
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import fred_stub_server as stub
+import pull_fed_data as pfd
+
+reports = ["AAA", "BBB"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(pfd, "report_list", reports)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub.StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield pfd.FredClient(
+            "test",
+            base_url="http://127.0.0.1:%d/fred/" % server.server_address[1],
+            per_minute=60000,
+            burst=100,
+            retries=0,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# A full pull written out and read back the way the downloader does it
+@pytest.fixture
+def store(client, tmp_path):
+    df, results = pfd.full_pull(client, pfd.load_store(str(tmp_path / "none.csv")))
+    assert (results["error"] == "").all()
+    path = str(tmp_path / "fed_dump.csv")
+    pfd.write_store(df, path)
+    return pfd.load_store(path)
+
+
+def stored_row(df, report_name, report_date, release_date):
+    return df[
+        (df["report_name"] == report_name)
+        & (df["report_date"] == report_date)
+        & (df["release_date"] == release_date)
+    ]
+
+
+def test_full_pull_has_every_report(store):
+    assert sorted(store["report_name"].unique()) == reports
+    assert not store.duplicated(pfd.key_columns).any()
+
+
+def test_repeat_pull_adds_nothing(client, store):
+    delta, results = pfd.incremental_pull(client, store)
+    assert (results["error"] == "").all()
+
+    merged, added = pfd.merge_delta(store, delta)
+    assert len(added) == 0
+    assert merged is store
+
+
+def test_revised_value_replaces_stored_row(client, store, monkeypatch):
+    # FRED revises the latest vintage of AAA's last report_date in place
+    make_observations = stub.make_observations
+
+    def revised(series_id):
+        observations = make_observations(series_id)
+        if series_id == "AAA":
+            last = observations[-1]
+            last["value"] = "%.1f" % (float(last["value"]) + 5)
+        return observations
+
+    monkeypatch.setattr(stub, "make_observations", revised)
+    last = make_observations("AAA")[-1]
+    key = ("AAA", last["date"], last["realtime_start"])
+    before = stored_row(store, *key)
+    assert len(before) == 1
+
+    delta, _ = pfd.incremental_pull(client, store)
+    merged, added = pfd.merge_delta(store, delta)
+
+    assert len(added) == 1
+    assert len(merged) == len(store)
+    after = stored_row(merged, *key)
+    assert len(after) == 1
+    assert after["data"].iloc[0] == pytest.approx(float(last["value"]) + 5)
+    assert after["hash"].iloc[0] != before["hash"].iloc[0]
+
+    # Everything else is untouched and a pull after the revision adds nothing
+    others = merged.drop(after.index)
+    pd.testing.assert_frame_equal(
+        others.sort_values(pfd.key_columns).reset_index(drop=True),
+        store.drop(before.index).sort_values(pfd.key_columns).reset_index(drop=True),
+    )
+    delta, _ = pfd.incremental_pull(client, merged)
+    assert len(pfd.merge_delta(merged, delta)[1]) == 0
@@ -0,0 +1,141 @@
+"""
+    Point-in-time lookups and category changes checked against a plain
+    filter + groupby over a small made up frame.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import support_functions as sf
+
+reports = ["AAA", "BBB", "CCC"]
+
+
+# A few reports with monthly report_dates and a random number of vintages
+# each, released on irregular days - in the layout format_fed_data gives
+def make_fed_df(seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for report in reports:
+        for report_date in pd.date_range("2010-01-01", periods=24, freq="MS"):
+            release = report_date + pd.Timedelta(days=int(rng.integers(20, 40)))
+            for vintage in range(int(rng.integers(1, 4))):
+                rows.append(
+                    {
+                        "release_date": release,
+                        "report_date": report_date,
+                        "report_data": round(float(rng.normal(100, 10)), 3),
+                        "report_name": report,
+                    }
+                )
+                release += pd.Timedelta(days=int(rng.integers(1, 60)))
+    df = pd.DataFrame(rows).sample(frac=1, random_state=seed)
+    return sf.format_fed_data(df.reset_index(drop=True))
+
+
+# What was known as of a date the obvious way - every vintage released by
+# then, keeping the last one of each report_date
+def brute_as_of(df, as_of, report_name=None):
+    df = df[df["release_date"] <= pd.Timestamp(as_of)]
+    if report_name is not None:
+        df = df[df["report_name"] == report_name]
+    df = df.sort_values(["report_name", "report_date", "release_date"])
+    return df.groupby(["report_name", "report_date"]).tail(1).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def fed_df():
+    return make_fed_df()
+
+
+# Before the first release, on and around releases, and after the last -
+# sorted and without repeats
+def as_of_dates(df):
+    first = df["release_date"].min()
+    last = df["release_date"].max()
+    releases = df["release_date"].drop_duplicates().sort_values()
+    dates = (
+        [first - pd.Timedelta(days=3650), first - pd.Timedelta(days=1), first]
+        + list(releases.iloc[:: max(len(releases) // 15, 1)])
+        + list(releases.iloc[:: max(len(releases) // 15, 1)] - pd.Timedelta(days=1))
+        + [last, last + pd.Timedelta(days=1), last + pd.Timedelta(days=3650)]
+    )
+    return sorted(set(dates))
+
+
+@pytest.mark.parametrize("report_name", [None] + reports)
+def test_as_of_matches_brute_force(fed_df, report_name):
+    vintages = sf.VintageIndex(fed_df)
+    for as_of in as_of_dates(fed_df):
+        expected = brute_as_of(fed_df, as_of, report_name)
+        result = vintages.as_of(as_of, report_name)
+        pd.testing.assert_frame_equal(result, expected, obj=str(as_of))
+
+
+def test_as_of_before_first_release_is_empty(fed_df):
+    vintages = sf.VintageIndex(fed_df)
+    first = fed_df["release_date"].min()
+    assert len(vintages.as_of(first - pd.Timedelta(days=1))) == 0
+    assert len(vintages.as_of(first)) > 0
+
+
+def test_as_of_unknown_report_is_empty(fed_df):
+    assert len(sf.VintageIndex(fed_df).as_of("2012-01-01", "ZZZ")) == 0
+
+
+@pytest.mark.parametrize("report_name", reports)
+def test_as_of_matrix_matches_brute_force(fed_df, report_name):
+    dates = as_of_dates(fed_df)
+    matrix = sf.VintageIndex(fed_df).as_of_matrix(report_name, dates)
+
+    report_dates = np.sort(
+        fed_df.loc[fed_df["report_name"] == report_name, "report_date"].unique()
+    )
+    np.testing.assert_array_equal(matrix.index.values, report_dates)
+    assert list(matrix.columns) == list(pd.DatetimeIndex(dates))
+
+    for position, as_of in enumerate(dates):
+        known = brute_as_of(fed_df, as_of, report_name).set_index("report_date")
+        expected = known["report_data"].reindex(matrix.index)
+        np.testing.assert_array_equal(matrix.iloc[:, position].values, expected.values)
+
+    # Nothing is known before the first release and everything after the last
+    assert matrix.iloc[:, :2].isna().all().all()
+    assert matrix.iloc[:, -3:].notna().all().all()
+
+
+def test_category_changes_match_per_report_changes(fed_df):
+    names = ["CCC", "AAA", "BBB"]
+    result = sf.category_changes(fed_df, names)
+
+    latest = brute_as_of(fed_df, fed_df["release_date"].max())
+    expected = []
+    for name in names:
+        df = latest[latest["report_name"] == name].reset_index(drop=True)
+        df["period_change"] = df["report_data"].pct_change()
+        df["relative_change"] = 1 - df["report_data"].iloc[0] / df["report_data"]
+        expected.append(df)
+    expected = pd.concat(expected, ignore_index=True)
+
+    assert list(result["report_name"]) == list(expected["report_name"])
+    np.testing.assert_array_equal(
+        result["report_date"].values, expected["report_date"].values
+    )
+    for column in ["report_data", "period_change", "relative_change"]:
+        np.testing.assert_allclose(
+            result[column].values, expected[column].values, rtol=1e-12
+        )
+    # The first row of each report has no earlier period to compare with
+    starts = expected.groupby("report_name", sort=False).head(1).index
+    assert result.loc[starts, "period_change"].isna().all()
+    assert (result.loc[starts, "relative_change"] == 0).all()
+
+
+def test_period_change_matches_pct_change(fed_df):
+    latest = brute_as_of(fed_df, fed_df["release_date"].max(), "AAA")
+    result = sf.period_change(latest.copy())
+    np.testing.assert_allclose(
+        result["period_change"].values[1:],
+        latest["report_data"].pct_change().values[1:],
+    )
+    assert result["relative_change"].iloc[0] == 0
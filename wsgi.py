@@ -0,0 +1,13 @@
+"""
+    Production entry point for gunicorn / uwsgi.
+
+    Exposes the Flask server behind the Dash app.  Run it with the bundled
+    gunicorn config, which preloads the app so the master data is loaded
+    once and shared by every worker:
+
+        gunicorn -c gunicorn.conf.py wsgi:server
+
+"""
+from main import app
+
+server = app.server